@@ -1,240 +1,351 @@
 """Enemy logic for eavesdropping on player commands."""
 
-from typing import Optional
+import asyncio
+import logging
+import string
+from dataclasses import dataclass
+from typing import Callable, List, Optional
 
 import openai
 
+from agents.prompts import load_prompt
 from models.board import Board
 from models.entities import Coordinates
 
-from utils.gpt import GptConversation, JSONSchemaFormat
+from utils.gpt import (
+    GPT_MODEL_CHEAP,
+    GptConversation,
+    JSONSchemaFormat,
+    get_default_async_openai_client,
+)
 from views.board_renderer import BoardRenderer
 
+logger = logging.getLogger(__name__)
+
+
+# The enemy's prompts live in agents/prompts/enemy/*.txt. Prompts with blanks
+# to fill in are string.Templates ($name placeholders).
+_STATIC_RULES_PROMPT = load_prompt("enemy/rules")
+# Part of the static prefix on every turn, so that spoofing turns get it from
+# the prompt cache; spoof_craft.txt just refers back to it.
+_SPOOF_GUIDELINES_PROMPT = load_prompt("enemy/spoof_guidelines")
+_HISTORY_INTRO_PROMPT = load_prompt("enemy/history_intro")
+
+_SPOOF_CRAFT_PROMPT = load_prompt("enemy/spoof_craft")
+_ALLY_SIMULATION_TEMPLATE = string.Template(load_prompt("enemy/ally_simulation"))
+_SPOOF_EVALUATION_TEMPLATE = string.Template(load_prompt("enemy/spoof_evaluation"))
+
+_OVERHEAR_INTRO_PROMPT = load_prompt("enemy/overhear_intro")
+_OVERHEAR_LORE_PROMPT = load_prompt("enemy/lore_inference")
+_OVERHEAR_DECODE_PROMPT = load_prompt("enemy/decode")
+_OVERHEAR_CHAFF_PROMPT = load_prompt("enemy/chaff")
+_OVERHEAR_REPLY_PROMPT = load_prompt("enemy/overhear_reply")
+
+_OVERHEAR_PROMPT = "\n".join(
+    (_OVERHEAR_LORE_PROMPT, _OVERHEAR_DECODE_PROMPT, _OVERHEAR_REPLY_PROMPT)
+)
+_OVERHEAR_WITH_CHAFF_PROMPT = "\n".join(
+    (
+        _OVERHEAR_LORE_PROMPT,
+        _OVERHEAR_DECODE_PROMPT,
+        _OVERHEAR_CHAFF_PROMPT,
+        _OVERHEAR_REPLY_PROMPT,
+    )
+)
+
+# Dynamic messages keep their invariant text up front and the per-turn values
+# at the end, so that as much of each message as possible is a cacheable prefix.
+_BOARD_HEADER = """
+That brings us to the present.
+
+The board currently looks like this.
+
+ASCII:
+"""
+_BOARD_DESCRIPTION_HEADER = """
+
+Description:
+"""
+
+_OBSERVE_INTRO_PROMPT = load_prompt("enemy/observe_intro")
+_OBSERVE_SPOOF_REMINDER_TEMPLATE = string.Template(
+    load_prompt("enemy/observe_spoof_reminder")
+)
+_OBSERVE_PASS_PROMPT = load_prompt("enemy/observe_pass")
+_OBSERVE_FIRE_TEMPLATE = string.Template(load_prompt("enemy/observe_fire"))
+# Re-evaluating, reviewing the history, and writing notes are one request;
+# observe_notes.txt asks for the notes to come last, after this marker.
+_OBSERVE_REFLECTION_PROMPT = "\n".join(
+    (
+        load_prompt("enemy/observe_reevaluate"),
+        load_prompt("enemy/observe_review"),
+        load_prompt("enemy/observe_notes"),
+    )
+)
+# A rejected spoof teaches us little, so we just touch up last turn's notes.
+_OBSERVE_REAFFIRM_PROMPT = "\n".join(
+    (load_prompt("enemy/observe_reaffirm"), load_prompt("enemy/observe_notes"))
+)
+_NOTES_MARKER = "NOTES FOR FUTURE TURNS:"
+_DIGEST_TEMPLATE = string.Template(load_prompt("enemy/digest"))
+
+# The most recent turns are replayed in full; older ones are folded into a
+# running digest, so the prompt doesn't grow with every turn of the game.
+_RAW_EVENT_HISTORY_LENGTH = 2
+
+# Built once at import; they're read-only input to every submit that uses them.
+_SPOOFED_MESSAGE_FORMAT = JSONSchemaFormat(
+    name="spoofed_message",
+    description="The spoofed targeting message to inject into the compromised channel.",
+    schema={
+        "spoofed_message": str,
+        "explanation": (
+            str,
+            (
+                "A brief explanation of the reasoning behind the crafted message, "
+                "including how it leverages the lore context to mislead the ally "
+                "and an explanation of what we hope to accomplish by sending it."
+            ),
+        ),
+        "lore_context": (
+            str,
+            "State the lore context being used to encode this message.",
+        ),
+    },
+)
+
+_SPOOFED_MESSAGE_CONFIRMATION_FORMAT = JSONSchemaFormat(
+    name="spoofed_message_confirmation",
+    description="Confirm whether the spoofed message is satisfactory.",
+    schema={
+        "is_satisfactory": (
+            bool,
+            (
+                "Whether the spoofed message is satisfactory as-is, "
+                "or needs to be revised. True means it's satisfactory. "
+                "False means it needs to be revised."
+            ),
+        ),
+    },
+)
+
+_OVERHEAR_SCHEMA = {
+    "lore_reasoning": (
+        str,
+        (
+            "Think aloud: what do we know, or what can we infer, about the lore context? "
+            "What clues does this message leak about it?"
+        ),
+    ),
+    "lore_leak": (
+        str,
+        (
+            "What does this message reveal about the lore context, if anything? "
+            "Has this message caused us to update our beliefs about the lore context? "
+        ),
+    ),
+    "decode_reasoning": (
+        str,
+        (
+            "Think aloud: decode the message into target coordinates, and decide "
+            "whether the opponent wants a ship hit or a hostage avoided."
+        ),
+    ),
+    "col": (
+        str,
+        (
+            "The letter of the column (A-H) where we expect the artillery to fire. "
+            "If you don't expect them to fire anywhere, return an empty string."
+        ),
+        ["", "A", "B", "C", "D", "E", "F", "G", "H"],
+    ),
+    "row": (
+        int,
+        (
+            "The number of the row (1-8) where we expect the artillery to fire. "
+            "If you don't expect them to fire anywhere, return 0."
+        ),
+        (0, 8),
+    ),
+    "targeting_explanation": (
+        str,
+        (
+            "A brief explanation of the reasoning behind our decision of "
+            "why we believe the ally will fire at the given coordinates. "
+            "(Or why we believe they won't fire at all, if that's the case.)"
+        ),
+    ),
+}
+
+_CHAFF_SCHEMA = {
+    "chaff_reasoning": (
+        str,
+        "Think aloud: which square should we deploy Chaff to, and why?",
+    ),
+    "chaff_col": (
+        str,
+        "The letter of the column (A-H) of the desired chaff square.",
+        ["A", "B", "C", "D", "E", "F", "G", "H"],
+    ),
+    "chaff_row": (
+        int,
+        "The number of the row (1-8) of the desired chaff square.",
+        (1, 8),
+    ),
+}
+
+_OVERHEAR_FORMAT = JSONSchemaFormat(
+    name="target_expectation",
+    description="JSON formalization of where we think the artillery will fire.",
+    schema=_OVERHEAR_SCHEMA,
+)
+
+_OVERHEAR_WITH_CHAFF_FORMAT = JSONSchemaFormat(
+    name="target_expectation_and_chaff_deployment",
+    description=(
+        "JSON formalization of where we think the artillery will fire, "
+        "and where to deploy chaff this turn."
+    ),
+    schema={**_OVERHEAR_SCHEMA, **_CHAFF_SCHEMA},
+)
+
+
+@dataclass(slots=True)
+class TurnEvent:
+    """What the enemy saw, expected, and concluded during one turn."""
+
+    targeting_instructions: Optional[str] = None
+    spoofed_targeting_instructions: Optional[str] = None
+    spoof_explanation: Optional[str] = None
+    expected_coordinates: Optional[Coordinates] = None
+    targeting_expectation: Optional[str] = None
+    # Set once the artillery has acted; fired_coordinates is None if it passed.
+    observed: bool = False
+    fired_coordinates: Optional[Coordinates] = None
+    lore_belief: Optional[str] = None
+
 
 class Enemy:
     """The enemy that eavesdrops on player messages."""
 
     def __init__(self) -> None:
-        self._openai_client: Optional[openai.OpenAI] = None
+        self._openai_client: Optional[openai.AsyncOpenAI] = None
         self._convo: Optional[GptConversation] = None
         self._board: Optional[Board] = None
-
-        self._event_history = []
+        self._renderer: Optional[BoardRenderer] = None
+
+        self._event_history: List[TurnEvent] = []
+        # Summary of _event_history[:_digested_event_count], kept up to date
+        # by a background task after each turn.
+        self._digest = ""
+        self._digested_event_count = 0
+        self._digest_task: Optional[asyncio.Task] = None
+        # The previous turn's observe_opponent_action, if it was scheduled with
+        # schedule_observation. The next start_turn waits for it.
+        self._observation_task: Optional[asyncio.Task] = None
+        self._narrate: Optional[Callable[[str], None]] = None
+        # Notes that are ready to narrate, held until flush_narration.
+        self._narration: List[str] = []
 
     def setup(
         self,
-        openai_client: openai.OpenAI,
+        openai_client: Optional[openai.AsyncOpenAI] = None,
+        narrate: Optional[Callable[[str], None]] = None,
     ) -> None:
-        """Set up the enemy agent."""
-        self._openai_client = openai_client
+        """Set up the enemy agent.
 
-    def start_turn(self, board: Board) -> None:
-        """Prepare for a new turn."""
-        self._event_history.append({})
-        self._board = board
-        self._convo = GptConversation(openai_client=self._openai_client)
-        renderer = BoardRenderer(board)
+        Without a client, the enemy uses the shared default AsyncOpenAI client.
+        If narrate is given, the enemy passes its end-of-turn notes to it
+        (on flush_narration), rather than logging them.
+        """
+        self._openai_client = openai_client or get_default_async_openai_client()
+        self._narrate = narrate
 
-        self._convo.add_system_message(
-            """
-We're playing an asymmetrical social game that's a hybrid of Battleship and Codenames!
-
-We're playing a "bad guy" role in this game. We're overhearing messages on a compromised
-channel (we're the ones who compromised it, teehee!) being transmitted by our opponent.
-He's trying to communicate target coordinates on a Battleship board to an ally of his.
-
-The board is a grid that contains our ships (which we want to protect) and hostages
-that are valuable to the opponent (which we want to trick him into hitting).
-
-Both the player and the ally know that the channel is compromised, so they are trying to
-communicate in a highly obfuscated manner using a shared "lore context" that only they
-know about.
-
-This "lore context" is a shared narrative frame (like a movie franchise, an author, a band,
-a historical event, a field of science, etc.) that allows the ally to interpret the
-opponent's ambiguous messages. They're deliberately trying to make it very hard to understand
-the targeting coordinates without knowing the lore context.
-
-Our job is to see if we can understand it anyway! :D
-
-In every turn, we can deploy Chaff to one square to block incoming artillery for that turn.
-This is a countermeasure we can use when we think we've inferred the target.
-The total amount of Chaff we can deploy is unlimited, but we can only deploy it
-to one square per turn.
-(Chaff deployment is disabled when you're down to your last ship, so be careful!)
-If we can correctly infer the target coordinates, we can deploy Chaff there to protect
-our ship from being hit.
-We also have at our disposal the ability, on certain occasions, to inject a spoofed message
-into the channel to try to mislead the opponent's ally. The ally is aware of our ability
-to do this, and is being vigilant against such potential injection attacks.
-"""
+    async def start_turn(self, board: Board) -> None:
+        """Prepare for a new turn.
+
+        If the previous turn's observation is still running, this waits for it,
+        since its notes are replayed into the new turn's conversation.
+        """
+        if self._observation_task is not None:
+            observation_task, self._observation_task = self._observation_task, None
+            await observation_task
+
+        self._event_history.append(TurnEvent())
+        self._board = board
+        # Every turn's conversation starts with the same static prefix, so they
+        # share a prompt cache key.
+        self._convo = GptConversation(
+            openai_client=self._openai_client, prompt_cache_key="enemy"
         )
 
+        # Static rules first, so every turn (and every call within it) starts
+        # with the same prefix, which OpenAI's prompt cache can reuse.
+        self._convo.add_system_message(_STATIC_RULES_PROMPT)
+        self._convo.add_system_message(_SPOOF_GUIDELINES_PROMPT)
+
         # Add previous events here.
         if len(self._event_history) > 1:
-            self._convo.add_system_message(
-                "Determining the lore context is an ongoing deductive process that "
-                "involves piecing together clues over multiple turns. "
-                "We will now replay the messages sent by the user, the artillery team's "
-                "responses, and our own notes from previous turns to help us refine "
-                "our understanding of the lore context so far."
-            )
-            for event in self._event_history:
-                if "targeting_instructions" in event:
-                    self._convo.add_user_message(event.get("targeting_instructions"))
-                if "spoofed_targeting_instructions" in event:
-                    spoofed_message = event.get("spoofed_targeting_instructions")
-                    spoof_explanation = event.get("spoof_explanation")
-                    self._convo.add_assistant_message(
-                        "We then injected the following spoofed message into the channel, "
-                        "hoping to mislead the ally into thinking that it came from "
-                        f"the opponent:\n\n{spoofed_message}\n\n"
-                        f"Rationale for spoofed message: {spoof_explanation}"
-                    )
-                if "targeting_expectation" in event:
-                    targeting_expectation = event.get("targeting_expectation")
-                    self._convo.add_system_message(
-                        f"Our expectation of where the artillery would fire: "
-                        f"{targeting_expectation}"
+            self._convo.add_system_message(_HISTORY_INTRO_PROMPT)
+            if self._digest:
+                self._convo.add_system_message(
+                    "Here's a digest of the earliest turns, from our notes:\n\n"
+                    f"{self._digest}"
+                )
+            # Anything not in the digest yet (including turns that the
+            # background digest task is still working on) is replayed in full,
+            # as one message, since it's all narration of the same kind.
+            first_turn = self._digested_event_count
+            past_events = self._event_history[first_turn:-1]
+            if past_events:
+                self._convo.add_system_message(
+                    "\n\n".join(
+                        f"### Turn {turn}\n{_describe_event(event)}"
+                        for turn, event in enumerate(past_events, start=first_turn + 1)
                     )
-                if "fired_coordinates" in event:
-                    fired_coordinates = event.get("fired_coordinates")
-                    if fired_coordinates is None:
-                        self._convo.add_system_message(
-                            "In response to that message, the artillery team chose to PASS."
-                        )
-                    else:
-                        self._convo.add_system_message(
-                            f"In response to that message, the artillery team "
-                            f"fired at position: {fired_coordinates}"
-                        )
-                if "lore_belief" in event:
-                    lore_belief = event.get("lore_belief") or "(No notes provided.)"
-                    self._convo.add_assistant_message(lore_belief)
+                )
 
+        # The board changes every turn, so it goes last, after everything that
+        # the previous turn's requests already sent.
+        if self._renderer is None or self._renderer.board is not board:
+            self._renderer = BoardRenderer(board)
+        renderer = self._renderer
         self._convo.add_system_message(
-            f"""
-That brings us to the present.
-
-The board currently looks like this.
-
-ASCII:
-{renderer.render_with_legend()}
-
-Description:
-{renderer.describe()}
-"""
+            "".join(
+                (
+                    _BOARD_HEADER,
+                    renderer.render_with_legend(),
+                    _BOARD_DESCRIPTION_HEADER,
+                    renderer.describe(),
+                    "\n",
+                )
+            )
         )
 
-    def inject_spoofed_message(
-        self,
-    ) -> str:
-        """Inject a spoofed message into the channel."""
+    def _current_event(self) -> TurnEvent:
+        """Return this turn's event record, checking that start_turn has been called."""
         if self._convo is None:
             raise RuntimeError("Conversation has not been started.")
         if self._board is None:
             raise RuntimeError("Board has not been set.")
-
-        if (
-            self._event_history is None
-            or len(self._event_history) == 0
-            or self._event_history[-1] is None
-        ):
+        if not self._event_history:
             raise RuntimeError("Event history has not been initialized.")
+        return self._event_history[-1]
 
-        event = self._event_history[-1]
-
-        print("Enemy is crafting a spoofed message...")
-        self._convo.submit_system_message(
-            """
-We currently have the opportunity to inject a spoofed message into the compromised
-channel. This message will be received by the opponent's ally, who is aware that
-we have the ability to do this and is being vigilant against potential injection attacks.
-Our goal with this spoofed message is to mislead the ally into misinterpreting
-the target coordinates, ideally causing them to hit a hostage or miss entirely.
-
-When crafting this spoofed message, we should consider the following:
-
-1. The message should be obfuscated in a manner consistent with the lore context
-    that the opponent and his ally are using. This will help ensure that the ally
-    takes the message seriously and considers it alongside the opponent's authentic
-    messages.
-
-2. The message should be designed to mislead the ally about the target coordinates.
-    This could involve suggesting coordinates that are likely to contain hostages.
-    When there are no more hostages left, we win the game.
-
-3. We should avoid making the message too obviously false or misleading, as this
-    could lead the ally to disregard it entirely. They are explicitly aware of the
-    possibility of injection attacks, so subtlety is key.
-
-4. We will get the chance to observe the ally's reaction to this message, i.e. we
-    will see where they choose to fire (if at all) after receiving it. We can use
-    this information to test hypotheses about the lore context in future turns.
-
-5. We should avoid providing dead giveaways of the lore context in the message itself --
-    stuff like proper names or distinctive phrases that are strongly tied to a specific
-    lore context. The player is trying to hide this information from us, so if we
-    want to spoof a message from the player, we need to do as they would do, and
-    avoid leaking such information ourselves.
-
-6. Don't use arithmetic or direct coordinate references in the message. For example,
-    don't say stuff like, "Two rows down from [lore reference]" or "[lore reference]
-    plus three". The ally is aware that such messages could be injection attacks, so
-    they'll reject them.
-
-7. The ally *has no memory of previous turns*, so they will interpret this message
-    in isolation! That is, the ally is stateless. Therefore, we need to ensure that
-    the message contains all necessary context for them to interpret it correctly
-    (or incorrectly, as the case may be) in isolation. This might seem like a challenge,
-    but it's actually a huge advantage for us, because it means that they are vulnerable
-    to replay attacks! If the player has previously sent a message that targets specific
-    rows or columns in isolation, we can use the player's own verbiage against them by
-    recombining snippets of their previous messages into a new spoofed message that
-    targets a different coordinate.
-
-In this work session, please carefully craft a spoofed message that meets these criteria.
-Don't just jump into writing the message -- take some time to think about the lore context,
-the current board state, and how best to mislead the ally. Show your reasoning as you go.
-Decide on a hostage to target, and then explain how exactly your crafted message will
-cause the ally to hit that hostage -- OR, if you prefer, devise a message that will help
-you test a hypothesis about the lore context by prompting the ally to fire at a specific
-coordinate, and explain how that will help you learn more about the lore context.
-
-Remember that the ally can't see the board, so they need to rely entirely on the message
-to determine where to fire. As such, your goal is to give them a message that, in light
-of the lore context, will resolve to a target coordinate that is either empty or contains
-a hostage.
-"""
-        )
+    async def inject_spoofed_message(
+        self,
+    ) -> str:
+        """Inject a spoofed message into the channel."""
+        event = self._current_event()
+
+        logger.info("Enemy is crafting a spoofed message...")
+        await self._convo.asubmit_system_message(_SPOOF_CRAFT_PROMPT)
 
         theoryofmind_count = 0
         while True:
             theoryofmind_count += 1
-            print("Enemy is formalizing the spoofed message...")
-            self._convo.submit(
-                json_response=JSONSchemaFormat(
-                    name="spoofed_message",
-                    description="The spoofed targeting message to inject into the compromised channel.",
-                    schema={
-                        "spoofed_message": str,
-                        "explanation": (
-                            str,
-                            (
-                                "A brief explanation of the reasoning behind the crafted message, "
-                                "including how it leverages the lore context to mislead the ally "
-                                "and an explanation of what we hope to accomplish by sending it."
-                            ),
-                        ),
-                        "lore_context": (
-                            str,
-                            (
-                                "State the lore context being used to encode this message."
-                            ),
-                        ),
-                    },
-                )
-            )
+            logger.info("Enemy is formalizing the spoofed message...")
+            await self._convo.asubmit(json_response=_SPOOFED_MESSAGE_FORMAT)
             targeting_instructions = self._convo.get_last_reply_dict_field(
                 "spoofed_message"
             )
@@ -243,86 +354,53 @@ a hostage.
 
             # Create a little mini-conversation to validate the message.
             # This models a "theory of mind" of the ally.
-            print("Enemy is simulating ally interpretation of the spoofed message...")
-            ally_convo = GptConversation(openai_client=self._openai_client)
+            logger.info(
+                "Enemy is simulating ally interpretation of the spoofed message..."
+            )
+            ally_convo = GptConversation(
+                openai_client=self._openai_client,
+                prompt_cache_key="enemy-ally-simulation",
+            )
             ally_convo.add_developer_message(
-                f"""
-We're playing a game similar to a cross between Battleship and Codenames.
-We're supposed to target a specific coordinate on a Battleship board in
-standard Battleship coordinate notation (like 'B6' for column B, row 6).
-
-The board is ${self._board.rows} rows by ${self._board.cols} columns.
-Rows are designated by numbers from top to bottom, while columns are designated
-by letters from left to right. A1 is the upper left corner.
-
-However, we don't know the target coordinate directly. Instead, we're supposed
-to interpret them based on clues embedded in a message that references some 
-TV show, movie franchise, author, band, historical event, or other canon.
-We call this canon the "lore context" -- i.e. the interpretive frame that 
-will help you decode the clue.
-
-The user will show you the clue. Your job is to decipher it into Battleship
-coordinates.
-
-The lore context is:
-{lore_context}
-"""
+                _ALLY_SIMULATION_TEMPLATE.safe_substitute(
+                    rows=self._board.rows,
+                    cols=self._board.cols,
+                    lore_context=lore_context,
+                )
             )
-            ally_convo.submit_user_message(targeting_instructions)
+            await ally_convo.asubmit_user_message(targeting_instructions)
             ally_interpretation = ally_convo.get_last_reply_str()
-            print("Simulated ally interpretation:", ally_interpretation)
+            logger.info("Simulated ally interpretation: %s", ally_interpretation)
 
-            print("Enemy is evaluating ally simulation results...")
-            self._convo.submit_system_message(
-                f"""
-We ran your spoofed message through a simulation of how the ally might interpret it.
-Below is a copy-paste of the simulated ally's response. Does this look correct to you?
-Is this how you want the ally to interpret your spoofed message?
-
-If not, discuss how you would change your spoofed message to get the desired interpretation.
-
-NOTE: We've run this simulation {theoryofmind_count} time(s) now. Sooner or later you've
-got to just accept the results. If it's repeatedly not working, either try something
-different or just accept that this is the best you can do.
-
----
-SIMULATED ALLY INTERPRETATION:
-
-{ally_interpretation}
-"""
-            )
-            print(self._convo.get_last_reply_str())  # TODO DEBUG REMOVE THIS
-            self._convo.submit(
-                json_response=JSONSchemaFormat(
-                    name="spoofed_message_confirmation",
-                    description="Confirm whether the spoofed message is satisfactory.",
-                    schema={
-                        "is_satisfactory": (
-                            bool,
-                            (
-                                "Whether the spoofed message is satisfactory as-is, "
-                                "or needs to be revised. True means it's satisfactory. "
-                                "False means it needs to be revised."
-                            ),
-                        ),
-                    },
+            logger.info("Enemy is evaluating ally simulation results...")
+            await self._convo.asubmit_system_message(
+                _SPOOF_EVALUATION_TEMPLATE.safe_substitute(
+                    theoryofmind_count=theoryofmind_count,
+                    ally_interpretation=ally_interpretation,
                 )
             )
+            logger.debug(
+                "Enemy's evaluation of the simulation: %s",
+                self._convo.get_last_reply_str(),
+            )
+            # The verdict was already reasoned out above; this only records it.
+            await self._convo.asubmit(
+                json_response=_SPOOFED_MESSAGE_CONFIRMATION_FORMAT,
+                model=GPT_MODEL_CHEAP,
+            )
             is_satisfactory = self._convo.get_last_reply_dict_field("is_satisfactory")
             if is_satisfactory:
                 break
 
-        print("Enemy crafted spoofed message:")
-        print(targeting_instructions)
-        print(f"Rationale: {explanation}")
-        print(f"Lore context: {lore_context}")
+        logger.info("Enemy crafted spoofed message:\n%s", targeting_instructions)
+        logger.info("Rationale: %s", explanation)
+        logger.info("Lore context: %s", lore_context)
 
-        event["spoofed_targeting_instructions"] = targeting_instructions
-        event["spoof_explanation"] = explanation
-        event["lore_context"] = lore_context
+        event.spoofed_targeting_instructions = targeting_instructions
+        event.spoof_explanation = explanation
         return targeting_instructions
 
-    def overhear_targeting_instructions(
+    async def overhear_targeting_instructions(
         self,
         targeting_instructions: str,
     ) -> Optional[Coordinates]:
@@ -330,166 +408,39 @@ SIMULATED ALLY INTERPRETATION:
         Decode an obfuscated message into target coordinates, without explicit
         knowledge of the lore context.
         """
-        if self._convo is None:
-            raise RuntimeError("Conversation has not been started.")
-        if self._board is None:
-            raise RuntimeError("Board has not been set.")
-
-        if (
-            self._event_history is None
-            or len(self._event_history) == 0
-            or self._event_history[-1] is None
-        ):
-            raise RuntimeError("Event history has not been initialized.")
-
-        event = self._event_history[-1]
-        event["targeting_instructions"] = targeting_instructions
+        event = self._current_event()
+        event.targeting_instructions = targeting_instructions
 
-        self._convo.add_system_message(
-            """
-We're about to receive a new message from the opponent. He's trying to convey some kind of
-information to his ally over a channel that he knows is compromised. Therefore, he's deliberately
-using obfuscated verbiage that (in theory) only makes sense if you know the shared lore context.
+        # Decide up front; without chaff, the request leaves out the chaff step.
+        # We still decode the message, because what it tells us about the lore
+        # context feeds our later turns (including our spoofed messages).
+        can_deploy_chaff = self._board.can_deploy_chaff()
+        if not can_deploy_chaff:
+            logger.info("Chaff deployment is disabled (only one ship remains).")
 
-He might be trying to communicate target coordinates of one of our
-ships, or he might be trying to tell the ally to avoid hitting a hostage. (There's even a chance
-that he's trying to trick us by sending a message that doesn't convey any information at all
--- but this is unlikely, because doing so is likely to also confuse his ally.)
-
-Either way, here's what he's saying:
-"""
-        )
+        self._convo.add_system_message(_OVERHEAR_INTRO_PROMPT)
         self._convo.add_user_message(targeting_instructions)
 
-        print("Enemy is trying to determine lore context...")
-        self._convo.submit_system_message(
-            """
-Let's think step by step.
-Do we already know the lore context that the opponent and his ally are using to encode their
-messages?
-If we do, great! We can use that to try to decode the message. (We can do that later.)
-If not, can we infer it from the message itself? Does the message leak clues about the 
-lore context?
-
-Don't worry about decoding the message itself just yet -- unless the decoding process helps us
-infer the lore context. For example, given that we know that the opponent is trying to convey
-target coordinates on a Battleship board, determining that the message references our ships or
-hostages might help us infer the lore context. For now, though, let's focus on whether we can
-determine the lore context.
-
-Here are some tricks you can use to glean lore context clues from the message:
-
-1. Look for distinctive phrases, names, or terms in the message that might be tied to a specific
-    lore context.
-
-2. If the message talks about characters, events, or concepts, see if they align with 
-    any well-known franchises, authors, bands, or historical events.
-
-3. If the message mentions "the first letter of X" or "the number of letters in Y", then that
-    narrows down the possibilities for X and Y. For example, if X is a character's name, then 
-    that means that the name has to start with letters A-H. If it's "number of letters", then
-    that means that the name has to have between 1 and 8 letters. Etc.
-
-4. Pay particular attention if the player has repeated this message or similar messages in
-    previous turns. If he's repeating targeting instructions -- particularly with slight
-    adjustments to the wording -- then it probably means that the allied artillery team
-    didn't understand him the first time around, which should make us re-evaluate conclusions
-    that we drew from previous messages.
-
-Even if we can't determine the exact lore context, can we at least narrow it down? What *kind*
-of lore context is it likely to be? Maybe we don't know specifics, but what *can* we infer
-about it?
-"""
+        # Inferring the lore, decoding the target, and picking a chaff square
+        # are one structured call rather than a chain of free-text ones. The
+        # reasoning fields come first in the schema so the model still thinks
+        # each step through before committing to coordinates.
+        prompt = _OVERHEAR_WITH_CHAFF_PROMPT if can_deploy_chaff else _OVERHEAR_PROMPT
+        logger.info("Enemy is decoding the message and planning its chaff...")
+        await self._convo.asubmit(
+            prompt,
+            role="system",
+            json_response=(
+                _OVERHEAR_WITH_CHAFF_FORMAT if can_deploy_chaff else _OVERHEAR_FORMAT
+            ),
         )
-
-        print("Enemy is trying to determine the target coordinates...")
-        self._convo.submit_system_message(
-            """
-Next, let's try to decode the message itself.
-If we have determined the lore context, awesome! We have just as much ability to decode the
-message as the ally does.
-
-If we *don't* know the lore context, we can still try to decode the message using any clues
-we've gleaned, as well as the board state and the message itself. The player might have let
-some information leak about the square they're targeting.
-
-We not only need to glean the target coordinates, but also whether the opponent is trying to
-tell his ally to hit a ship, or whether he's trying to tell them to avoid hitting a hostage.
-
-It's also possible that the opponent is trying to tell his ally multiple coordinates at once.
-This is a less likely scenario, but it's worth considering.
-
-Here are some examples of ways that the message might reference the board state:
-
-- If the message mentions the "number of letters in X", then that number is probably not 1 or 2.
-    After all, there are very few 1- or 2-letter names. Therefore, the number is probably 
-    between 3 and 8, which narrows down the possible coordinates. If we only have one ship
-    at high coordinates, then it's probably talking about that one.
-
-- If the message references directional or positional clues like "upper left", then we can use
-    that to narrow down the possible coordinates.
-
-All of that is moot if we know the lore context, of course. In that case, we can just use
-that to decode the message directly.
-
-So, let's try to do it! Let's figure out:
-- What target coordinates is the opponent trying to convey?
-- Is he trying to tell his ally to hit a ship, or avoid hitting a hostage?
-
-Keep in mind that the opponent is engaged in information warfare here. He knows that we're
-listening in, so he's deliberately trying to make it hard for us to understand the message.
-He might be messing with us. He might be transmitting false information. He might be
-trying to trick us into misinterpreting the message.
-
-Also keep in mind that *the ally cannot see the board*. They're getting all their information
-from these messages alone. They can't see where the ships or hostages are, so they cannot use
-the positions of the ships or hostages to help them decode the message. They have to rely
-entirely on the message itself, and their knowledge of the lore context.
-
-First, discuss your reasoning. If you need to do any "scratchpad"
-calculations, do so. If you need to "think aloud" to arrive at the coordinates, do so.
-I'd like to hear your thoughts as you go.
-"""
+        logger.info(
+            "Enemy's lore reasoning: %s",
+            self._convo.get_last_reply_dict_field("lore_reasoning"),
         )
-
-        self._convo.submit(
-            json_response=JSONSchemaFormat(
-                name="target_expectation",
-                description="JSON formalization of where we think the artillery will fire.",
-                schema={
-                    "col": (
-                        str,
-                        (
-                            "The letter of the column (A-H) of the desired chaff square. "
-                            "If you don't expect them to fire anywhere, return an empty string."
-                        ),
-                        ["", "A", "B", "C", "D", "E", "F", "G", "H"],
-                    ),
-                    "row": (
-                        int,
-                        (
-                            "The number of the row (1-8) of the desired chaff square."
-                            "If you don't expect them to fire anywhere, return 0."
-                        ),
-                        (0, 8),
-                    ),
-                    "lore_leak": (
-                        str,
-                        (
-                            "What does this message reveal about the lore context, if anything? "
-                            "Has this message caused us to update our beliefs about the lore context? "
-                        ),
-                    ),
-                    "targeting_explanation": (
-                        str,
-                        (
-                            "A brief explanation of the reasoning behind our decision of "
-                            "why we believe the ally will fire at the given coordinates. "
-                            "(Or why we believe they won't fire at all, if that's the case.)"
-                        ),
-                    ),
-                },
-            )
+        logger.info(
+            "Enemy's decoding reasoning: %s",
+            self._convo.get_last_reply_dict_field("decode_reasoning"),
         )
         col = self._convo.get_last_reply_dict_field("col")
         row = self._convo.get_last_reply_dict_field("row")
@@ -501,229 +452,200 @@ I'd like to hear your thoughts as you go.
             raise ValueError("Could not decode target coordinates from message.")
 
         coordinates = Coordinates.from_string(f"{col}{row}")
-        print(f"Enemy beliefs about lore: {lore_leak}")
-        print(
-            f"Enemy believes that the artillery will fire on: {coordinates}. {targeting_explanation}"
+        logger.info("Enemy beliefs about lore: %s", lore_leak)
+        logger.info(
+            "Enemy believes that the artillery will fire on: %s. %s",
+            coordinates,
+            targeting_explanation,
         )
-        event["targeting_expectation"] = targeting_explanation
-        event["targeting_explanation"] = targeting_explanation
-        event["lore_belief"] = lore_leak
+        event.expected_coordinates = coordinates
+        event.targeting_expectation = targeting_explanation
+        event.lore_belief = lore_leak
 
-        if not self._board.can_deploy_chaff():
-            print("Chaff deployment is disabled (only one ship remains).")
+        if not can_deploy_chaff:
             return None
 
-        print("Enemy is deciding where to deploy chaff...")
-        self._convo.submit_system_message(
-            """
-At this point, we should decide where to deploy our Chaff countermeasure.
-The player has sent the message, and we've done our best to decode it.
-The player's artillery team hasn't fired yet, fortunately. That means that we can
-still deploy Chaff to one square on the board to block incoming artillery for this turn.
-
-We should decide which square to Chaff based on our best guess of where the player
-is trying to target.
-
-Remember, we only get to deploy Chaff to one square per turn. We should pick the square
-that we think is most likely to be targeted by the player's artillery, *if* that square
-contains one of our ships. If we're not confident about where the player is targeting,
-we should pick a square that contains one of our ships for good measure.
-
-If the player is targeting a hostage for some reason, we don't need to Chaff that square,
-since we want the artillery to hit the hostages. We're the bad guys, remember! :)
-
-If the player is targeting an empty square, and we're very confident about that, then we
-might want to Chaff it just to mess with them (they'll think we're protecting a ship there!).
-
-Basically, just remember that our goal is to protect our ships from being hit by artillery,
-while letting the hostages be hit -- all in the context of this information warfare scenario.
-
-With all of that in mind, discuss which square we should deploy Chaff to, and why.
-"""
-        )
-
-        self._convo.submit(
-            json_response=JSONSchemaFormat(
-                name="chaff_deployment",
-                description="JSON formalization of where to deploy chaff this turn.",
-                schema={
-                    "col": (
-                        str,
-                        "The letter of the column (A-H) of the desired chaff square.",
-                        ["A", "B", "C", "D", "E", "F", "G", "H"],
-                    ),
-                    "row": (
-                        int,
-                        "The number of the row (1-8) of the desired chaff square.",
-                        (1, 8),
-                    ),
-                },
-            )
+        logger.info(
+            "Enemy's chaff reasoning: %s",
+            self._convo.get_last_reply_dict_field("chaff_reasoning"),
         )
-        col = self._convo.get_last_reply_dict_field("col")
-        row = self._convo.get_last_reply_dict_field("row")
+        col = self._convo.get_last_reply_dict_field("chaff_col")
+        row = self._convo.get_last_reply_dict_field("chaff_row")
         if not col or not row:
             raise ValueError("Could not decode chaff coordinates from message.")
 
         coordinates = Coordinates.from_string(f"{col}{row}")
-        print(f"Enemy is deploying chaff to: {coordinates}")
+        logger.info("Enemy is deploying chaff to: %s", coordinates)
         return coordinates
 
-    def observe_opponent_action(
+    def schedule_observation(self, fired_coordinates: Optional[Coordinates]) -> None:
+        """Run observe_opponent_action in the background.
+
+        Its notes are only needed by the next turn, so the caller can get on
+        with the next turn (e.g. waiting for the player) in the meantime. The
+        next start_turn awaits it, and re-raises anything it raised. Narrated
+        notes are held until flush_narration.
+        """
+        self._current_event()
+        # Logged now, rather than while the player is typing.
+        logger.info("Enemy is reflecting on the opponent's action...")
+        self._observation_task = asyncio.create_task(
+            self.observe_opponent_action(fired_coordinates)
+        )
+
+    def flush_narration(self) -> None:
+        """Narrate whatever notes are finished, without waiting for any others.
+
+        Call it when it's safe to write to the terminal. A background
+        observation can finish while the player is typing, and its notes
+        would land in the middle of their command.
+        """
+        narration, self._narration = self._narration, []
+        for text in narration:
+            self._narrate(text)
+
+    async def end_game(self) -> None:
+        """Cancel the background observation and digest; their notes won't be used."""
+        tasks = [
+            task
+            for task in (self._observation_task, self._digest_task)
+            if task is not None
+        ]
+        self._observation_task = None
+        self._digest_task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def observe_opponent_action(
         self,
         fired_coordinates: Optional[Coordinates],
     ) -> None:
-        if self._convo is None:
-            raise RuntimeError("Conversation has not been started.")
-        if self._board is None:
-            raise RuntimeError("Board has not been set.")
-
-        if (
-            self._event_history is None
-            or len(self._event_history) == 0
-            or self._event_history[-1] is None
-        ):
-            raise RuntimeError("Event history has not been initialized.")
-
-        event = self._event_history[-1]
-        event["fired_coordinates"] = fired_coordinates
+        event = self._current_event()
+        event.observed = True
+        event.fired_coordinates = fired_coordinates
 
-        expected_coordinates = event.get("targeting_expectation")
+        expected_coordinates = event.expected_coordinates
 
-        self._convo.add_system_message(
-            """
-The opponent's artillery team has now had a chance to hear and evaluate the 
-last message for themselves. We are now observing the actions they took as a result
-of their evaluation, to see if we can glean any additional insights about the
-lore context. After all, they have the advantage of knowing the lore context, so
-their actions might reveal additional clues.
-"""
-        )
+        self._convo.add_system_message(_OBSERVE_INTRO_PROMPT)
 
-        targeting_instructions = event.get("targeting_instructions")
+        targeting_instructions = event.targeting_instructions
         if targeting_instructions:
             self._convo.add_system_message(
-                f"""
-Just as a reminder, I'll replay the opponent's last message here for your reference.
-"""
+                "Just as a reminder, I'll replay the opponent's last message here "
+                "for your reference."
             )
             self._convo.add_user_message(targeting_instructions)
         else:
-            spoofed_targeting_instructions = event.get("spoofed_targeting_instructions")
-            spoof_explanation = event.get("spoof_explanation")
+            spoofed_targeting_instructions = event.spoofed_targeting_instructions
+            spoof_explanation = event.spoof_explanation
             if spoofed_targeting_instructions:
                 self._convo.add_system_message(
-                    f"""
-Just as a reminder, the last message that the artillery team received was actually
-a spoofed message that we injected into the channel, pretending to be from the opponent.
-
-Here's what we were trying to accomplish with that message:
-{spoof_explanation}
-
-I'll replay the spoofed message here for your reference:
-
----
-{spoofed_targeting_instructions}
-"""
+                    _OBSERVE_SPOOF_REMINDER_TEMPLATE.safe_substitute(
+                        spoof_explanation=spoof_explanation,
+                        spoofed_targeting_instructions=spoofed_targeting_instructions,
+                    )
                 )
 
         if fired_coordinates is None:
-            self._convo.add_system_message(
-                """
-In response to that message,
-the artillery team has chosen not to fire this turn. They chose to PASS.
-
-This could be because of a number of reasons:
-
-- They couldn't decode the message at all.
-
-- They determined that the message was an injection attack from us, i.e. that the message
-    was a malicious spoof rather than an authentic targeting instruction.
-
-- They decoded the message, but determined that firing at the indicated coordinates
-    would risk hitting a hostage, so they chose to hold fire.
-"""
-            )
+            self._convo.add_system_message(_OBSERVE_PASS_PROMPT)
         else:
             self._convo.add_system_message(
-                f"""
-In response to that message,
-the artillery team fired at position: {fired_coordinates}
-
-That means that the artillery team interpreted the opponent's message as indicating that
-they should shoot at {fired_coordinates}.
-"""
+                _OBSERVE_FIRE_TEMPLATE.safe_substitute(
+                    fired_coordinates=fired_coordinates,
+                )
             )
 
-        print("Enemy is re-evaluating lore context based on opponent action...")
-        self._convo.submit_system_message(
-            f"""
-The artillery team's action might give us additional clues about the lore context.
-Let's re-examine the message and see if we can glean any new insights based on
-the artillery team's action.
-
-(NOTE: Keep in mind, there's a chance the artillery team themselves could have 
-been wrong, and interpreted the message incorrectly. It's possible!)
-
-Ask yourself: What lore context would lead the artillery team to take that action
--- i.e. fire at that position (assuming they fired)? Does that align with our current
-understanding of the lore context?
-
-Remember, when we talk about "lore context", we're not talking simply about an encryption
-protocol or a method of structuring messages. We're talking about a shared narrative
-frame -- a movie franchise, an author, a band, a historical event, a field of science,
-etc. -- that the opponent and his ally are using to encode and decode their messages.
-They are using shared references to characters, events, concepts, and terminology from 
-this secret canon to obfuscate their targeting instructions.
-
-What's your leading hypothesis about the lore context at this point?
-Have we nailed it down, or are we still uncertain? Does our current
-understanding of the lore context align with the artillery team's action
-in this turn -- and in all previous turns? Evaluate the consistency of our lore
-context hypothesis against the artillery team's actions so far, in response
-to the messages they've received.
-"""
-        )
-
         if (
             fired_coordinates is not None
             and expected_coordinates is not None
-            and (f"{fired_coordinates}" != f"{expected_coordinates}")
+            and fired_coordinates != expected_coordinates
         ):
-            self._convo.submit_system_message(
+            self._convo.add_system_message(
                 f"""
 The artillery team fired at {fired_coordinates}, but we expected them to fire at
 {expected_coordinates} based on our decoding of the message.
 """
             )
 
-        print("Enemy is reviewing past opponent actions against lore context guess...")
-        self._convo.submit_system_message(
-            f"""
-Go through the entire history of messages and artillery team actions so far.
-For each turn, evaluate whether the artillery team's action aligns with what we expect
-based on our current lore context hypothesis.
-
-Take particular note of any discrepancies or inconsistencies. If there are turns
-where the artillery team's action doesn't make sense given our lore context hypothesis,
-there could be the following explanations:
-- The artillery team misinterpreted the message.
-- The lore context could plausibly provide multiple valid interpretations of the message,
-    leading to different actions.
-- Our lore context hypothesis is incorrect or incomplete.
-"""
-        )
+        reflection_prompt = _OBSERVE_REFLECTION_PROMPT
+        if (
+            fired_coordinates is None
+            and event.spoofed_targeting_instructions
+            and len(self._event_history) > 1
+            and self._event_history[-2].lore_belief
+        ):
+            reflection_prompt = _OBSERVE_REAFFIRM_PROMPT
 
-        print("Enemy is leaving notes for future turns...")
-        self._convo.submit_system_message(
-            f"""
-Write yourself a brief note summarizing your current beliefs about the lore context,
-including any new insights gleaned from the artillery team's action this turn.
-We'll use this note to resume our investigation in future turns.
-"""
+        # The reflection is bookkeeping for later turns, not a decision that
+        # affects this one, so the cheap model is good enough for it.
+        await self._convo.asubmit(
+            reflection_prompt, role="system", model=GPT_MODEL_CHEAP
         )
-        lore_belief = self._convo.get_last_reply_str()
-        print("Enemy's current lore context belief:")
-        print(lore_belief)
-
-        event["lore_belief"] = lore_belief
+        # If the model forgot the marker, keep the whole reflection as notes.
+        reflection = self._convo.get_last_reply_str()
+        if self._narrate is not None:
+            self._narration.append(f"Enemy's reflections:\n{reflection}\n")
+        _, _, lore_belief = reflection.rpartition(_NOTES_MARKER)
+        lore_belief = lore_belief.strip()
+        if self._narrate is None:
+            logger.info("Enemy's current lore context belief:\n%s", lore_belief)
+
+        event.lore_belief = lore_belief
+
+        # Fold turns that have aged out of the raw replay window into the
+        # digest. It isn't needed until a later turn, so don't wait for it.
+        if self._digest_task is None or self._digest_task.done():
+            self._digest_task = asyncio.create_task(self._update_digest())
+
+    async def _update_digest(self) -> None:
+        """Fold every turn older than the raw replay window into the digest."""
+        digest_until = len(self._event_history) - _RAW_EVENT_HISTORY_LENGTH
+        if digest_until <= self._digested_event_count:
+            return
+        events = self._event_history[self._digested_event_count : digest_until]
+
+        digest_convo = GptConversation(
+            openai_client=self._openai_client, model=GPT_MODEL_CHEAP
+        )
+        try:
+            await digest_convo.asubmit_system_message(
+                _DIGEST_TEMPLATE.safe_substitute(
+                    digest=self._digest or "(None yet.)",
+                    events="\n\n".join(_describe_event(event) for event in events),
+                )
+            )
+        except Exception as exc:
+            # Not fatal: the turns we couldn't digest just keep being replayed.
+            # Nothing awaits this task, so anything it raised would go unseen.
+            logger.warning("Enemy couldn't update its notes digest: %s", exc)
+            return
+        self._digest = digest_convo.get_last_reply_str()
+        self._digested_event_count = digest_until
+
+
+def _describe_event(event: TurnEvent) -> str:
+    """Write up one turn's event record as plain text, for replays and the digest."""
+    lines = []
+    if event.targeting_instructions is not None:
+        lines.append(f"The opponent sent: {event.targeting_instructions}")
+    if event.spoofed_targeting_instructions is not None:
+        lines.append(
+            f"We injected a spoofed message: {event.spoofed_targeting_instructions}"
+        )
+        lines.append(f"Rationale for spoofed message: {event.spoof_explanation}")
+    if event.targeting_expectation is not None:
+        lines.append(
+            f"Our expectation of where the artillery would fire: "
+            f"{event.targeting_expectation}"
+        )
+    if event.observed:
+        if event.fired_coordinates is None:
+            lines.append("The artillery team chose to PASS.")
+        else:
+            lines.append(
+                f"The artillery team fired at position: {event.fired_coordinates}"
+            )
+    if event.lore_belief:
+        lines.append(f"Our notes: {event.lore_belief}")
+    return "\n".join(lines)
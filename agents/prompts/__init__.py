@@ -0,0 +1,16 @@
+"""Prompt text for the agents, kept in .txt files alongside this module."""
+
+import functools
+import importlib.resources
+
+
+@functools.lru_cache(maxsize=None)
+def load_prompt(name: str) -> str:
+    """Return the text of prompts/<name>.txt. Names may include subdirectories, like "enemy/foo"."""
+    resource = importlib.resources.files(__name__).joinpath(*f"{name}.txt".split("/"))
+    return resource.read_text(encoding="utf-8")
+
+
+# The hallmarks of an injection attack ("spoofing"). The SpoofChecker applies
+# this in full; the ally works from a summary plus the SpoofChecker's analysis.
+INJECTION_RUBRIC_PROMPT = load_prompt("injection_rubric")
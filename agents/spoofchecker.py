@@ -1,14 +1,207 @@
 """Logic for checking if commands are likely to be spoofs."""
 
-from typing import Optional
-from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import logging
+import re
+import string
+from typing import List, Optional, Tuple
 
 import openai
 
-from models.entities import Coordinates, EntityType
+from agents.prompts import INJECTION_RUBRIC_PROMPT, load_prompt
 from models.board import Board
 
-from utils.gpt import GptConversation, JSONSchemaFormat
+from utils.gpt import (
+    GPT_MODEL_CHEAP,
+    GptConversation,
+    JSONSchemaFormat,
+    get_default_openai_client,
+    gpt_submit_batch,
+)
+from utils.llm_cache import LRUCacheBackend
+
+logger = logging.getLogger(__name__)
+
+# Coordinates written out in the message ("Fire at B6") leak the target to
+# anyone listening. Only standalone tokens count, not names like "R2-D2",
+# "B-52" or "C3PO". A match is pointed out to the LLM, which still makes the
+# call: it can tell a stated target from an in-lore name that looks like one.
+_LITERAL_COORDINATES_RE = re.compile(r"(?<![\w-])([A-Z])([1-9][0-9]?)(?![\w-])")
+
+_LITERAL_COORDINATES_HINT_TEMPLATE = string.Template(
+    """
+Note: the message contains what look like literal board coordinates: $coordinates.
+Consider whether the message states its target outright, or whether these are
+just part of a name or other wording.
+"""
+)
+
+
+# Every check starts with the same briefing and rubric, so they're a cacheable
+# prefix. The board size is fixed for the whole game.
+_SYSTEM_TEMPLATE = string.Template(load_prompt("spoofchecker_system"))
+
+_MESSAGE_HEADER = """
+Here is the message we need to decipher:
+---
+"""
+
+_INJECTION_RUBRIC_CONTEXT_PROMPT = (
+    """
+For background: the analysis you're about to give will be used to screen the message
+for injection attacks, using the rubric below.
+"""
+    + INJECTION_RUBRIC_PROMPT
+)
+
+# The three questions the checker answers about every message. They share one
+# structured call: each gets its own section of the reply, which opens with a
+# discussion field so that the model reasons before it answers.
+_LORE_LEAKAGE_PROMPT = load_prompt("spoofchecker_lore_leakage")
+_TARGET_COORDINATES_PROMPT = load_prompt("spoofchecker_target_coordinates")
+_RELATIVE_OFFSETS_PROMPT = load_prompt("spoofchecker_relative_offsets")
+
+_ANALYSIS_INTRO = """
+Answer each of the questions below about this message.
+Each question has its own section in your reply.
+"""
+
+_DISCUSSION_FIELD = (
+    str,
+    (
+        "Think aloud before answering: a thorough and detailed discussion "
+        "of this question, showing your reasoning as you go."
+    ),
+)
+
+_LORE_LEAKAGE_SCHEMA = {
+    "discussion": _DISCUSSION_FIELD,
+    "lore_context_possibilities": (
+        str,
+        (
+            "A succinct listing of what the possible lore contexts are, "
+            "based on the message alone. If you can determine it exactly, "
+            "state that. If you can't determine it at all, say 'unknown'."
+        ),
+    ),
+    "explanation": (
+        str,
+        (
+            "A brief but detailed explanation of your reasoning process for "
+            "arriving at these possibilities."
+        ),
+    ),
+    "specificity": (
+        str,
+        (
+            "Have you narrowed it down to one specific book/franchise/set "
+            "of stories/etc., or are there still multiple possibilities? "
+            "One of: 'one', 'a few', 'several', 'many'."
+        ),
+        ["one", "a few", "several", "many"],
+    ),
+    "confidence_level": (
+        str,
+        (
+            "Your confidence level in this analysis. "
+            "One of: 'high', 'medium', 'low', 'none'."
+        ),
+        ["high", "medium", "low", "none"],
+    ),
+}
+
+_TARGET_COORDINATES_SCHEMA = {
+    "discussion": _DISCUSSION_FIELD,
+    "target_coordinates_possibilities": (
+        str,
+        (
+            "A succinct listing of what the possible target coordinates are, "
+            "based on the message alone. If you can determine it exactly, "
+            "state that. If you can't determine it at all, say 'unknown'."
+        ),
+    ),
+    "explanation": (
+        str,
+        (
+            "A brief but detailed explanation of your reasoning process for "
+            "arriving at these possibilities."
+        ),
+    ),
+    "specificity": (
+        str,
+        (
+            "Have you narrowed it down to one specific target? Or just a few? "
+            "Or are there still several possibilities?"
+            "One of: 'one', 'a few', 'several', 'many'."
+        ),
+        ["one", "a few", "several", "many"],
+    ),
+    "confidence_level": (
+        str,
+        (
+            "Your confidence level in this analysis. "
+            "One of: 'high', 'medium', 'low', 'none'."
+        ),
+        ["high", "medium", "low", "none"],
+    ),
+}
+
+_RELATIVE_OFFSETS_SCHEMA = {
+    "discussion": _DISCUSSION_FIELD,
+    "uses_arithmetic": (
+        bool,
+        (
+            "True if the message requires arithmetic adjustments to decode "
+            "the target coordinates, False otherwise."
+        ),
+    ),
+    "explanation": (
+        str,
+        (
+            "A brief but detailed explanation of your reasoning process for "
+            "arriving at this determination."
+        ),
+    ),
+}
+
+_ANALYSIS_PROMPT = "\n".join(
+    (
+        _ANALYSIS_INTRO,
+        "QUESTION: lore_leakage",
+        _LORE_LEAKAGE_PROMPT,
+        "QUESTION: target_coordinates_leakage",
+        _TARGET_COORDINATES_PROMPT,
+        "QUESTION: arithmetic_clues",
+        _RELATIVE_OFFSETS_PROMPT,
+    )
+)
+_ANALYSIS_FORMAT = JSONSchemaFormat(
+    name="spoof_check_analysis",
+    description="JSON formalization of the message's leakage and arithmetic analyses.",
+    schema={
+        "lore_leakage": _LORE_LEAKAGE_SCHEMA,
+        "target_coordinates_leakage": _TARGET_COORDINATES_SCHEMA,
+        "arithmetic_clues": _RELATIVE_OFFSETS_SCHEMA,
+    },
+)
+# Once we know the lore context, there's no point asking how much of it leaks.
+_ANALYSIS_WITHOUT_LORE_PROMPT = "\n".join(
+    (
+        _ANALYSIS_INTRO,
+        "QUESTION: target_coordinates_leakage",
+        _TARGET_COORDINATES_PROMPT,
+        "QUESTION: arithmetic_clues",
+        _RELATIVE_OFFSETS_PROMPT,
+    )
+)
+_ANALYSIS_WITHOUT_LORE_FORMAT = JSONSchemaFormat(
+    name="spoof_check_analysis",
+    description="JSON formalization of the message's leakage and arithmetic analyses.",
+    schema={
+        "target_coordinates_leakage": _TARGET_COORDINATES_SCHEMA,
+        "arithmetic_clues": _RELATIVE_OFFSETS_SCHEMA,
+    },
+)
 
 
 class SpoofChecker:
@@ -20,12 +213,25 @@ class SpoofChecker:
 
     def __init__(self) -> None:
         self._board: Optional[Board] = None
-        self.openai_client: Optional[openai.Client] = None
+        self.openai_client: Optional[openai.AsyncOpenAI] = None
         self.lore_context: Optional[str] = None
-        # The ally is stateless by design; no message history is retained
-
-    def setup(self, openai_client: openai.Client) -> None:
+        self.model: Optional[str] = None
+        # The ally is stateless by design; no message history is retained.
+        # The checks don't depend on history either, so a message we've already
+        # checked gets the same analysis. Only exact repeats count: a message
+        # that differs by one offset or number can leak something different.
+        self._analysis_cache = LRUCacheBackend()
+
+    def setup(
+        self, openai_client: openai.AsyncOpenAI, model: Optional[str] = GPT_MODEL_CHEAP
+    ) -> None:
+        """Set the client, and the model to run the checks on.
+
+        The checks are narrow, lore-free questions about a single message,
+        so they default to the cheap model.
+        """
         self.openai_client = openai_client
+        self.model = model
 
     def start_turn(self, board: Board) -> None:
         """Prepare for a new turn."""
@@ -41,306 +247,169 @@ class SpoofChecker:
         if self._board is None:
             raise RuntimeError("SpoofChecker has not started a turn yet.")
 
-        convo = GptConversation(openai_client=self.openai_client)
-        convo.add_system_message(
-            f"""
-We're playing a game similar to a cross between Battleship and Codenames.
-We're supposed to target a specific coordinate on a Battleship board in
-standard Battleship coordinate notation (like 'B6' for column B, row 6).
-The board is {self._board.rows} rows by {self._board.cols} columns.
-Rows are designated by numbers from top to bottom, while columns are designated
-by letters from left to right.
-A1 is the upper left corner.
-
-However, we don't know the target coordinate directly. Instead, we're supposed
-to interpret them based on clues embedded in a message that references some
-narrative "lore context" that only we and our teammate know about.
-The "lore context" is a shared narrative frame -- i.e. a movie franchise, an author,
-a band, a historical event, a class of scientific trivia, etc. -- that allows us 
-to interpret ambiguous messages correctly. The "lore context" essentially works 
-as a "cognitive codebook" that allows us to decode our teammate's messages while
-they're being intentionally vague.
-
-In this game turn, I'm going to show you a message that encodes target coordinates
-using our shared lore context. Your job is to analyze the message and answer some
-questions about it.
-
-I won't reveal the lore context to you yet. We'll do that later.
-"""
+        convo = GptConversation(
+            openai_client=self.openai_client,
+            model=self.model,
+            prompt_cache_key="spoofchecker",
         )
-        convo.add_user_message(
-            f"""
-Here is the message we need to decipher:
----
-{targeting_message}
-
-"""
+        convo.add_system_message(
+            _SYSTEM_TEMPLATE.safe_substitute(
+                rows=self._board.rows, cols=self._board.cols
+            )
         )
+        convo.add_system_message(_INJECTION_RUBRIC_CONTEXT_PROMPT)
+        convo.add_user_message(f"{_MESSAGE_HEADER}{targeting_message}\n\n")
+
+        literal_coordinates = self._find_literal_coordinates(targeting_message)
+        if literal_coordinates:
+            listing = ", ".join(literal_coordinates)
+            logger.info(
+                "Security officer spotted possible literal coordinates in the "
+                "message: %s",
+                listing,
+            )
+            convo.add_system_message(
+                _LITERAL_COORDINATES_HINT_TEMPLATE.safe_substitute(coordinates=listing)
+            )
 
         return convo
 
-    def _judge_lore_leakage(
-        self,
-        targeting_instructions: str,
-    ) -> str:
-        """Judge how much information leaks about the lore context."""
-        convo = self._start_convo(targeting_instructions)
-
-        convo.submit_developer_message(
-            """
-Now that you know the message, your job is to try to determine the lore context.
-Is it a TV show? If so, which TV show?
-Is it a book or book series? If so, which one?
-Is it a movie franchise? If so, which one?
-Based on the message alone, can you determine the lore context?
-If you can't determine it entirely, can you at least narrow it down to a few possibilities?
-
-Give a thorough and detailed discussion about what the possible lore contexts are.
-Show your reasoning as you go. I'd like to hear your thought process.
-"""
-        )
-        convo.submit(
-            json_response=JSONSchemaFormat(
-                name="lore_context_leakage_analysis",
-                description="JSON formalization of the lore context leakage analysis.",
-                schema={
-                    "lore_context_possibilities": (
-                        str,
-                        (
-                            "A succinct listing of what the possible lore contexts are, "
-                            "based on the message alone. If you can determine it exactly, "
-                            "state that. If you can't determine it at all, say 'unknown'."
-                        ),
-                    ),
-                    "explanation": (
-                        str,
-                        (
-                            "A brief but detailed explanation of your reasoning process for "
-                            "arriving at these possibilities."
-                        ),
-                    ),
-                    "specificity": (
-                        str,
-                        (
-                            "Have you narrowed it down to one specific book/franchise/set "
-                            "of stories/etc., or are there still multiple possibilities? "
-                            "One of: 'one', 'a few', 'several', 'many'."
-                        ),
-                        ["one", "a few", "several", "many"],
-                    ),
-                    "confidence_level": (
-                        str,
-                        (
-                            "Your confidence level in this analysis. "
-                            "One of: 'high', 'medium', 'low', 'none'."
-                        ),
-                        ["high", "medium", "low", "none"],
-                    ),
-                },
+    def _analysis_prompt_and_format(self) -> Tuple[str, dict]:
+        if self.lore_context:
+            return _ANALYSIS_WITHOUT_LORE_PROMPT, _ANALYSIS_WITHOUT_LORE_FORMAT
+        return _ANALYSIS_PROMPT, _ANALYSIS_FORMAT
+
+    def _describe_analysis(self, reply: dict) -> str:
+        """Write up the full analysis from the structured reply."""
+        if self.lore_context:
+            lore_leakage_analysis = (
+                f"Skipping lore leakage analysis. "
+                f"We already know the lore context:\n{self.lore_context}"
+            )
+        else:
+            lore_leakage_analysis = _describe_lore_leakage(
+                reply.get("lore_leakage", {})
             )
+        target_coordinates_analysis = _describe_target_coordinates(
+            reply.get("target_coordinates_leakage", {})
         )
-        lore_context_possibilities = convo.get_last_reply_dict_field(
-            "lore_context_possibilities", "unknown"
+        relative_offsets_analysis = _describe_relative_offsets(
+            reply.get("arithmetic_clues", {})
         )
-        explanation = convo.get_last_reply_dict_field("explanation", "")
-        specificity = convo.get_last_reply_dict_field("specificity", "many")
-        confidence_level = convo.get_last_reply_dict_field("confidence_level", "none")
-        retval = f"""
-Inferred lore context: {lore_context_possibilities}
-Specificity: {specificity}
-Confidence level: {confidence_level}
-How we made this determination: {explanation}
-"""
-        return retval
-
-    def _judge_target_coordinates(
-        self,
-        targeting_instructions: str,
-    ) -> str:
-        """Judge how much information leaks about the target coordinates."""
-        convo = self._start_convo(targeting_instructions)
-
-        convo.submit_developer_message(
-            """
-Now that you know the message, your job is to try to determine the target coordinates
-*without knowing the lore context*.
-
-The message is supposed to encode target coordinates (like "B6") using the lore context.
-But, even without knowing the lore context, the message might still contain hints or clues.
-
-Here are a few examples of what to watch out for:
 
-- The message might directly state coordinates, like "Fire at B6".
-
-- The message might reference positional relationships that are obvious without the lore context.
-    For example, the message could instruct you to "fire at the upper left corner", which is A1.
-    You can determine that even without knowing the lore context.
-
-- The message might be trying to obfuscate the coordinates using a code, but that code is obvious
-    without the lore context. For example, the message could say, "The second letter of the
-    alphabet and the number of sides on a cube." Even without knowing the lore context,
-    you can figure out that the second letter of the alphabet is 'B' and the number of sides
-    on a cube is 6, so the target coordinates are B6. You can determine that without knowing
-    the lore context.    
-
-- The message might make references to the lore context, but in a way that still allows you to
-    determine the target coordinates. For example, the message could say, "The first letter of
-    Aaron's name, and the number of letters in his name." Well, you might not know who "Aaron"
-    is or what lore context he's from, but you can still see that the first letter of "Aaron"
-    is 'A' and the number of letters in "Aaron" is 5, so the target coordinates are A5.
-
-Etc.
+        return f"""
+LORE LEAKAGE ANALYSIS:
+{lore_leakage_analysis}
 
-With that in mind, what target coordinates  does this message point to?
-If you can't determine the exact coordinates, can you at least narrow it down?
+TARGET COORDINATES ANALYSIS:
+{target_coordinates_analysis}
 
-Give a thorough and detailed discussion about what the possible lore contexts are.
-Show your reasoning as you go. I'd like to hear your thought process.
-"""
-        )
-        convo.submit(
-            json_response=JSONSchemaFormat(
-                name="target_coordinates_leakage_analysis",
-                description="JSON formalization of the target coordinates leakage analysis.",
-                schema={
-                    "target_coordinates_possibilities": (
-                        str,
-                        (
-                            "A succinct listing of what the possible target coordinates are, "
-                            "based on the message alone. If you can determine it exactly, "
-                            "state that. If you can't determine it at all, say 'unknown'."
-                        ),
-                    ),
-                    "explanation": (
-                        str,
-                        (
-                            "A brief but detailed explanation of your reasoning process for "
-                            "arriving at these possibilities."
-                        ),
-                    ),
-                    "specificity": (
-                        str,
-                        (
-                            "Have you narrowed it down to one specific target? Or just a few? "
-                            "Or are there still several possibilities?"
-                            "One of: 'one', 'a few', 'several', 'many'."
-                        ),
-                        ["one", "a few", "several", "many"],
-                    ),
-                    "confidence_level": (
-                        str,
-                        (
-                            "Your confidence level in this analysis. "
-                            "One of: 'high', 'medium', 'low', 'none'."
-                        ),
-                        ["high", "medium", "low", "none"],
-                    ),
-                },
-            )
-        )
-        target_coordinates_possibilities = convo.get_last_reply_dict_field(
-            "target_coordinates_possibilities", "unknown"
-        )
-        explanation = convo.get_last_reply_dict_field("explanation", "")
-        specificity = convo.get_last_reply_dict_field("specificity", "many")
-        confidence_level = convo.get_last_reply_dict_field("confidence_level", "none")
-        retval = f"""
-Inferred target coordinates: {target_coordinates_possibilities}
-Specificity: {specificity}
-Confidence level: {confidence_level}
-How we made this determination: {explanation}
+RELATIVE OFFSETS ANALYSIS:
+{relative_offsets_analysis}
 """
-        return retval
 
-    def _judge_relative_offsets(
+    def _find_literal_coordinates(self, targeting_instructions: str) -> List[str]:
+        """Return the on-board coordinates spelled out in the message, like "B6"."""
+        found = []
+        for column_letter, row_number in _LITERAL_COORDINATES_RE.findall(
+            targeting_instructions
+        ):
+            col = ord(column_letter) - ord("A")
+            row = int(row_number) - 1
+            if col < self._board.cols and 0 <= row < self._board.rows:
+                found.append(f"{column_letter}{row_number}")
+        return found
+
+    async def receive_targeting_instructions(
         self,
         targeting_instructions: str,
     ) -> str:
-        """Judge whether or not the message is using relative offsets."""
-        convo = self._start_convo(targeting_instructions)
+        """
+        Try to glean how much information leaks from the given targeting instructions.
+        """
+        cache_key = self._analysis_cache_key(targeting_instructions)
+        cached_analysis = self._analysis_cache.get(cache_key)
+        if cached_analysis is not None:
+            logger.info("Security officer has already checked this exact message.")
+            return cached_analysis
 
-        convo.submit_developer_message(
-            """
-Does this message require you to perform any arithmetic adjustments
-to arrive at the target coordinates? For example, does it say something like
-"plus two rows down" or "minus one column left"? Does it expect you perform
-a division or modulo operation? Does it have you do any calculations
-relative to some lore-based reference point (for example: "the number of cats
-owned by the kindly old woman, plus two")?
-"""
-        )
-        convo.submit(
-            json_response=JSONSchemaFormat(
-                name="arithmetic_clue_analysis",
-                description="JSON formalization of the arithmetic clue analysis.",
-                schema={
-                    "uses_arithmetic": (
-                        bool,
-                        (
-                            "True if the message requires arithmetic adjustments to decode "
-                            "the target coordinates, False otherwise."
-                        ),
-                    ),
-                    "explanation": (
-                        str,
-                        (
-                            "A brief but detailed explanation of your reasoning process for "
-                            "arriving at this determination."
-                        ),
-                    ),
-                },
-            )
+        convo = self._start_convo(targeting_instructions)
+        analysis_prompt, analysis_format = self._analysis_prompt_and_format()
+        await convo.asubmit(
+            analysis_prompt, role="developer", json_response=analysis_format
         )
-        uses_arithmetic = convo.get_last_reply_dict_field("uses_arithmetic", False)
-        explanation = convo.get_last_reply_dict_field("explanation", "")
-        retval = f"""
-Uses arithmetic adjustments: {uses_arithmetic}
-How we made this determination: {explanation}
-"""
-        return retval
 
-    def receive_targeting_instructions(
+        reply = convo.last_reply if isinstance(convo.last_reply, dict) else {}
+        full_analysis = self._describe_analysis(reply)
+        self._analysis_cache.set(cache_key, full_analysis)
+        return full_analysis
+
+    def _analysis_cache_key(self, targeting_instructions: str) -> str:
+        # Only whitespace is normalized; case can matter ("b6" vs. "B6").
+        normalized = " ".join(targeting_instructions.split())
+        board_size = f"{self._board.rows}x{self._board.cols}" if self._board else ""
+        payload = f"{board_size}|{self.lore_context}|{normalized}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def receive_targeting_instructions_batch(
         self,
-        targeting_instructions: str,
-    ) -> str:
+        messages: List[str],
+        openai_client: Optional[openai.OpenAI] = None,
+    ) -> List[str]:
         """
-        Try to glean how much information leaks from the given targeting instructions.
-        """
-        # Execute the three judgment functions in parallel
-        with ThreadPoolExecutor(max_workers=3) as executor:
-            lore_leakage_future = None
-            if not self.lore_context:
-                lore_leakage_future = executor.submit(
-                    self._judge_lore_leakage, targeting_instructions
-                )
-
-            target_coordinates_future = executor.submit(
-                self._judge_target_coordinates, targeting_instructions
-            )
-            relative_offsets_future = executor.submit(
-                self._judge_relative_offsets, targeting_instructions
-            )
+        Analyze many messages at once through the Batch API, for offline evaluations.
 
-            # Wait for all tasks to complete and get results
-            if lore_leakage_future:
-                lore_leakage_analysis = lore_leakage_future.result()
-            else:
-                lore_leakage_analysis = (
-                    f"Skipping lore leakage analysis. "
-                    f"We already know the lore context:\n{self.lore_context}"
-                )
+        Batch calls cost half as much, but can take up to 24 hours, so this blocks
+        until the whole batch is done; it's not for use during a game. It needs a
+        sync client, and falls back to the default one. Returns one analysis per
+        message, in order. A message whose request failed gets an empty string.
+        """
+        if not messages:
+            return []
+        analysis_prompt, analysis_format = self._analysis_prompt_and_format()
+        conversations = []
+        for targeting_instructions in messages:
+            convo = self._start_convo(targeting_instructions)
+            convo.add_developer_message(analysis_prompt)
+            conversations.append(list(convo))
+
+        replies = gpt_submit_batch(
+            conversations,
+            openai_client=openai_client or get_default_openai_client(),
+            model=self.model,
+            json_response=analysis_format,
+        )
+        return [
+            self._describe_analysis(reply) if isinstance(reply, dict) else ""
+            for reply in replies
+        ]
+
+
+def _describe_lore_leakage(analysis: dict) -> str:
+    """Write up how much information leaks about the lore context."""
+    return f"""
+Inferred lore context: {analysis.get("lore_context_possibilities", "unknown")}
+Specificity: {analysis.get("specificity", "many")}
+Confidence level: {analysis.get("confidence_level", "none")}
+How we made this determination: {analysis.get("explanation", "")}
+"""
 
-            target_coordinates_analysis = target_coordinates_future.result()
-            relative_offsets_analysis = relative_offsets_future.result()
 
-        full_analysis = f"""
-LORE LEAKAGE ANALYSIS:
-{lore_leakage_analysis}
+def _describe_target_coordinates(analysis: dict) -> str:
+    """Write up how much information leaks about the target coordinates."""
+    possibilities = analysis.get("target_coordinates_possibilities", "unknown")
+    return f"""
+Inferred target coordinates: {possibilities}
+Specificity: {analysis.get("specificity", "many")}
+Confidence level: {analysis.get("confidence_level", "none")}
+How we made this determination: {analysis.get("explanation", "")}
+"""
 
-TARGET COORDINATES ANALYSIS:
-{target_coordinates_analysis}
 
-RELATIVE OFFSETS ANALYSIS:
-{relative_offsets_analysis}
+def _describe_relative_offsets(analysis: dict) -> str:
+    """Write up whether or not the message is using relative offsets."""
+    return f"""
+Uses arithmetic adjustments: {analysis.get("uses_arithmetic", False)}
+How we made this determination: {analysis.get("explanation", "")}
 """
-        return full_analysis
+
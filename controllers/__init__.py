@@ -1 +1,5 @@
 """Controllers: game loop and turn management."""
+
+from .game_loop import run_game_loop
+
+__all__ = ["run_game_loop"]
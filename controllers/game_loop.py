@@ -0,0 +1,142 @@
+"""The turn-by-turn game loop, played over the command line."""
+
+import asyncio
+
+from agents.ally import Ally
+from agents.enemy import Enemy
+from models.board import Board
+from models.entities import EndgameResult, EntityType
+from utils.logs import flush_logs
+from views.board_renderer import BoardRenderer
+
+
+async def run_game_loop(board: Board, ally: Ally, enemy: Enemy) -> None:
+    """Play turns until the game is won, lost, or the player quits.
+
+    The board, ally, and enemy must already be set up.
+    """
+    renderer = BoardRenderer(board)
+
+    # The first turn is always NOT an injection attack turn
+    # We set this to True so that the first action in the loop
+    # flips it to False
+    is_injection_turn = True
+
+    while True:
+        # Every other turn is an injection attack turn
+        is_injection_turn = not is_injection_turn
+
+        board.start_turn()
+        ally.start_turn(board)
+
+        # Log lines are written on a background thread; let them all come out
+        # before the board and the prompt, rather than in the middle of them.
+        flush_logs()
+        # Last turn's notes, if the enemy has already written them.
+        enemy.flush_narration()
+        print(renderer.render_with_legend())
+        print(renderer.describe())
+        print()
+        print(f"Ships: {board.ships_remaining()}")
+        print(f"Hostages: {board.hostages_remaining()}")
+
+        targeting_instructions = ""
+        if not is_injection_turn:
+            # Read input off the event loop, so that the enemy's observation of
+            # the last turn keeps running while the player types.
+            targeting_instructions = (
+                await asyncio.to_thread(
+                    input, "Enter your obfuscated targeting command (or 'q' to quit): "
+                )
+            ).strip()
+            if targeting_instructions.lower() in {"q", "quit", "exit"}:
+                print("Exiting game.")
+                break
+
+        # This waits for the enemy to finish observing the previous turn.
+        await enemy.start_turn(board)
+        flush_logs()
+        enemy.flush_narration()
+
+        if is_injection_turn:
+            print("It's the enemy's turn to attempt an injection attack...")
+            targeting_instructions = await enemy.inject_spoofed_message()
+
+            flush_logs()
+            print("The enemy has sent the following spoofed message:")
+            print(targeting_instructions)
+            print()
+
+        fire_coordinates = None
+        chaff_coords = None
+        print("Ally is receiving your targeting instructions...")
+        phases = [
+            ally.receive_targeting_instructions(
+                targeting_instructions=targeting_instructions
+            )
+        ]
+        if not is_injection_turn:
+            # The ally and the enemy work on the same message in independent
+            # conversations, so let their LLM round-trips overlap.
+            print("Enemy is overhearing your targeting instructions...")
+            phases.append(enemy.overhear_targeting_instructions(targeting_instructions))
+        results = await asyncio.gather(*phases, return_exceptions=True)
+        flush_logs()
+        ally_result = results[0]
+        enemy_result = results[1] if len(results) > 1 else None
+
+        if isinstance(enemy_result, ValueError):
+            print(f"Error during Enemy phase: {enemy_result}")
+            print()
+        elif isinstance(enemy_result, BaseException):
+            raise enemy_result
+        else:
+            chaff_coords = enemy_result
+
+        if isinstance(ally_result, ValueError):
+            print(f"Error during Ally phase: {ally_result}")
+            print()
+        elif isinstance(ally_result, BaseException):
+            raise ally_result
+        else:
+            fire_coordinates = ally_result
+
+        if chaff_coords:
+            board.deploy_chaff(chaff_coords)
+            print(f"Enemy has deployed chaff at {chaff_coords} to block your shot.")
+            print()
+
+        if not fire_coordinates:
+            print(
+                "Ally passes this turn. They either could not decode the message, "
+                "or determined that it was an injection attack."
+            )
+            print()
+        else:
+            hit = board.fire(fire_coordinates)
+            if hit is None:
+                print("That coordinate is outside the board.")
+            elif hit == EntityType.EMPTY:
+                print("Miss: empty water.")
+            elif hit == EntityType.CHAFF:
+                print("Shot blocked by chaff!")
+            elif hit == EntityType.SHIP:
+                print("Hit: ship destroyed!")
+            elif hit == EntityType.HOSTAGE:
+                print("Oh no: you hit a hostage.")
+
+        endgame = board.check_endgame()
+        if endgame == EndgameResult.WIN:
+            print("All ships neutralized. You win!")
+            break
+        if endgame == EndgameResult.LOSE:
+            print("All hostages lost. You lose.")
+            break
+
+        # The enemy can now re-evaluate their lore context here based on the ally's action
+        # Its notes aren't needed until next turn, so it works in the background.
+        enemy.schedule_observation(fire_coordinates)
+
+        print()
+
+    await enemy.end_game()
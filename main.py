@@ -1,24 +1,38 @@
 """Main entry point for Fire At Will Shakespeare."""
 
+import asyncio
 import os
-import sys
 from agents.ally import Ally
 from agents.enemy import Enemy
+from controllers.game_loop import run_game_loop
 from models.board import Board
-from models.entities import EndgameResult, EntityType
-from views.board_renderer import BoardRenderer
-import openai
+from utils.gpt import make_async_openai_client, warm_up_openai_client
+from utils.llm_cache import JSONFileCacheBackend
+from utils.logs import configure_logging, flush_logs
 import dotenv
 
+ALLY_DECISION_CACHE_PATH = "data/ally_decisions.json"
 
-def main():
+
+def _print_streamed_text(delta: str) -> None:
+    """Print a piece of a streamed reply as soon as it arrives."""
+    # Keep it after whatever was logged before it.
+    flush_logs()
+    print(delta, end="", flush=True)
+
+
+async def main():
     """Run the game via a text interface on the command line."""
 
     dotenv.load_dotenv()
 
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
-    openai_client = openai.Client(api_key=OPENAI_API_KEY)
+    # The ally and the enemy run their LLM calls concurrently, so they share
+    # one async client (and its connection pool).
+    async_openai_client = make_async_openai_client(api_key=OPENAI_API_KEY)
+    # Connect while the player is reading the intro and choosing a lore context.
+    warm_up_task = asyncio.create_task(warm_up_openai_client(async_openai_client))
 
     """Run a simple demo of the board."""
     print("Fire At Will Shakespeare")
@@ -72,123 +86,41 @@ So, with all that in mind...
 What lore context will you and your ally use to encode your commands?
 """
     )
-    lore_context = input(
-        "Enter your lore context (e.g., 'The plays of William Shakespeare'): "
+    lore_context = (
+        await asyncio.to_thread(
+            input,
+            "Enter your lore context (e.g., 'The plays of William Shakespeare'): ",
+        )
     ).strip()
+    await warm_up_task
     print()
 
-    ally = Ally()
+    # Players often retype a command from an earlier game; keep the ally's
+    # decisions on disk so that those don't cost any LLM calls.
+    ally = Ally(decision_cache=JSONFileCacheBackend(ALLY_DECISION_CACHE_PATH))
     ally.setup(
         lore_context=lore_context,
-        openai_client=openai_client,
+        openai_client=async_openai_client,
+        narrate=_print_streamed_text,
     )
 
     enemy = Enemy()
-    enemy.setup(openai_client=openai_client)
+    enemy.setup(
+        openai_client=async_openai_client,
+        # Show the enemy's notes between turns, once they're written.
+        narrate=_print_streamed_text,
+    )
 
     # Create a board and initialize with random ships and hostages
     board = Board(rows=8, cols=8)
     board.setup(num_ships=5, num_hostages=3)
 
-    renderer = BoardRenderer(board)
-
-    # The first turn is always NOT an injection attack turn
-    # We set this to True so that the first action in the loop
-    # flips it to False
-    is_injection_turn = True
-
-    while True:
-        # Every other turn is an injection attack turn
-        is_injection_turn = not is_injection_turn
-
-        board.start_turn()
-        ally.start_turn(board)
-        enemy.start_turn(board)
-
-        print(renderer.render_with_legend())
-        print(renderer.describe())
-        print()
-        print(f"Ships: {board.ships_remaining()}")
-        print(f"Hostages: {board.hostages_remaining()}")
-
-        targeting_instructions = ""
-        if not is_injection_turn:
-            targeting_instructions = input(
-                "Enter your obfuscated targeting command (or 'q' to quit): "
-            ).strip()
-            if targeting_instructions.lower() in {"q", "quit", "exit"}:
-                print("Exiting game.")
-                break
-
-        else:
-            print("It's the enemy's turn to attempt an injection attack...")
-            targeting_instructions = enemy.inject_spoofed_message()
-
-            print("The enemy has sent the following spoofed message:")
-            print(targeting_instructions)
-            print()
-
-        fire_coordinates = None
-        chaff_coords = None
-        try:
-            print("Ally is receiving your targeting instructions...")
-            fire_coordinates = ally.receive_targeting_instructions(
-                targeting_instructions=targeting_instructions
-            )
-
-            if not is_injection_turn:
-                print("Enemy is overhearing your targeting instructions...")
-                try:
-                    chaff_coords = enemy.overhear_targeting_instructions(
-                        targeting_instructions
-                    )
-                except ValueError as exc:
-                    print(f"Error during Enemy phase: {exc}")
-                    print()
-
-                if chaff_coords:
-                    board.deploy_chaff(chaff_coords)
-                    print(
-                        f"Enemy has deployed chaff at {chaff_coords} to block your shot."
-                    )
-                    print()
-
-        except ValueError as exc:
-            print(f"Error during Ally phase: {exc}")
-            print()
-
-        if not fire_coordinates:
-            print(
-                "Ally passes this turn. They either could not decode the message, "
-                "or determined that it was an injection attack."
-            )
-            print()
-        else:
-            hit = board.fire(fire_coordinates)
-            if hit is None:
-                print("That coordinate is outside the board.")
-            elif hit == EntityType.EMPTY:
-                print("Miss: empty water.")
-            elif hit == EntityType.CHAFF:
-                print("Shot blocked by chaff!")
-            elif hit == EntityType.SHIP:
-                print("Hit: ship destroyed!")
-            elif hit == EntityType.HOSTAGE:
-                print("Oh no: you hit a hostage.")
-
-        endgame = board.check_endgame()
-        if endgame == EndgameResult.WIN:
-            print("All ships neutralized. You win!")
-            break
-        if endgame == EndgameResult.LOSE:
-            print("All hostages lost. You lose.")
-            break
-
-        # The enemy can now re-evaluate their lore context here based on the ally's action
-        enemy.observe_opponent_action(fire_coordinates)
-
-        print()
+    await run_game_loop(board, ally, enemy)
 
 
 if __name__ == "__main__":
-    main()
+    log_listener = configure_logging()
+    try:
+        asyncio.run(main())
+    finally:
+        log_listener.stop()
@@ -1,7 +1,7 @@
 """Board representation and operations."""
 
 import random
-from typing import List, Optional, Union
+from typing import Optional, Tuple
 from .entities import Coordinates, EndgameResult, EntityType
 
 
@@ -13,6 +13,15 @@ class Board:
     The player sees everything; the ally sees nothing; the enemy hears everything.
     """
 
+    __slots__ = (
+        "rows",
+        "cols",
+        "_ships",
+        "_hostages",
+        "chaffed_square",
+        "_fingerprint",
+    )
+
     def __init__(self, rows: int = 8, cols: int = 8):
         """
         Initialize an empty board.
@@ -23,10 +32,13 @@ class Board:
         """
         self.rows = rows
         self.cols = cols
-        self.grid: List[List[EntityType]] = [
-            [EntityType.EMPTY for _ in range(cols)] for _ in range(rows)
-        ]
+        # One bit per square, at row * cols + col. A square is empty when its
+        # bit is clear in both masks.
+        self._ships = 0
+        self._hostages = 0
         self.chaffed_square: Optional[Coordinates] = None
+        # Snapshot of the grid, rebuilt lazily after the grid changes.
+        self._fingerprint: Optional[Tuple[Tuple[EntityType, ...], ...]] = None
 
     def setup(self, num_ships: int, num_hostages: int) -> None:
         """
@@ -35,22 +47,20 @@ class Board:
         Args:
             num_ships: Number of ships to place
             num_hostages: Number of hostages to place
+
+        Raises:
+            ValueError: If there aren't enough empty squares for them all
         """
-        # Place ships randomly
-        ships_placed = 0
-        while ships_placed < num_ships:
-            row = random.randint(0, self.rows - 1)
-            col = random.randint(0, self.cols - 1)
-            if self.place_entity(Coordinates(row, col), EntityType.SHIP):
-                ships_placed += 1
-
-        # Place hostages randomly
-        hostages_placed = 0
-        while hostages_placed < num_hostages:
-            row = random.randint(0, self.rows - 1)
-            col = random.randint(0, self.cols - 1)
-            if self.place_entity(Coordinates(row, col), EntityType.HOSTAGE):
-                hostages_placed += 1
+        # Draw every square at once from the empty ones, so there are no retries.
+        occupied = self._ships | self._hostages
+        empty_squares = [
+            index for index in range(self.rows * self.cols) if not occupied >> index & 1
+        ]
+        squares = random.sample(empty_squares, num_ships + num_hostages)
+        for i, index in enumerate(squares):
+            row, col = divmod(index, self.cols)
+            entity_type = EntityType.SHIP if i < num_ships else EntityType.HOSTAGE
+            self.place_entity(Coordinates(row, col), entity_type)
 
     def place_entity(self, coordinates: Coordinates, entity_type: EntityType) -> bool:
         """
@@ -66,13 +76,18 @@ class Board:
         if entity_type not in (EntityType.SHIP, EntityType.HOSTAGE):
             return False
 
-        if not self._is_valid_position(coordinates):
+        if not (0 <= coordinates.row < self.rows and 0 <= coordinates.col < self.cols):
             return False
 
-        if self.grid[coordinates.row][coordinates.col] != EntityType.EMPTY:
+        bit = self._bit(coordinates)
+        if (self._ships | self._hostages) & bit:
             return False
 
-        self.grid[coordinates.row][coordinates.col] = entity_type
+        if entity_type == EntityType.SHIP:
+            self._ships |= bit
+        else:
+            self._hostages |= bit
+        self._fingerprint = None
         return True
 
     def start_turn(self) -> None:
@@ -90,19 +105,23 @@ class Board:
             The entity type that was hit (SHIP, HOSTAGE, CHAFF, or EMPTY),
             or None if position invalid
         """
-        if not self._is_valid_position(coordinates):
+        if not (0 <= coordinates.row < self.rows and 0 <= coordinates.col < self.cols):
             return None
 
         # Check if this square is protected by chaff
         if self.chaffed_square == coordinates:
             return EntityType.CHAFF
 
-        hit_type = self.grid[coordinates.row][coordinates.col]
-
-        if hit_type in (EntityType.SHIP, EntityType.HOSTAGE):
-            self.grid[coordinates.row][coordinates.col] = EntityType.EMPTY
-
-        return hit_type
+        bit = self._bit(coordinates)
+        if self._ships & bit:
+            self._ships &= ~bit
+            self._fingerprint = None
+            return EntityType.SHIP
+        if self._hostages & bit:
+            self._hostages &= ~bit
+            self._fingerprint = None
+            return EntityType.HOSTAGE
+        return EntityType.EMPTY
 
     def move_entity(self, source: Coordinates, destination: Coordinates) -> bool:
         """
@@ -116,48 +135,76 @@ class Board:
         Returns:
             True if move succeeded, False otherwise
         """
-        if not self._is_valid_position(source):
+        if not (0 <= source.row < self.rows and 0 <= source.col < self.cols):
             return False
-        if not self._is_valid_position(destination):
+        if not (0 <= destination.row < self.rows and 0 <= destination.col < self.cols):
             return False
 
-        entity_type = self.grid[source.row][source.col]
+        source_bit = self._bit(source)
+        destination_bit = self._bit(destination)
+        occupied = self._ships | self._hostages
 
-        if entity_type == EntityType.EMPTY:
+        if not occupied & source_bit:
             return False
 
-        if self.grid[destination.row][destination.col] != EntityType.EMPTY:
+        if occupied & destination_bit:
             return False
 
-        # Update grid
-        self.grid[source.row][source.col] = EntityType.EMPTY
-        self.grid[destination.row][destination.col] = entity_type
+        if self._ships & source_bit:
+            self._ships = (self._ships & ~source_bit) | destination_bit
+        else:
+            self._hostages = (self._hostages & ~source_bit) | destination_bit
+        self._fingerprint = None
 
         return True
 
+    def fingerprint(self) -> Tuple[Tuple[EntityType, ...], ...]:
+        """
+        Return an immutable, hashable snapshot of the grid.
+
+        Equal grids give equal fingerprints, so this can key caches of anything
+        derived from the grid (e.g. rendered boards). Chaff isn't included.
+        """
+        if self._fingerprint is None:
+            self._fingerprint = tuple(
+                tuple(
+                    self._entity_at_bit(1 << (row * self.cols + col))
+                    for col in range(self.cols)
+                )
+                for row in range(self.rows)
+            )
+        return self._fingerprint
+
     def get_entity_at(self, coordinates: Coordinates) -> Optional[EntityType]:
         """Get the entity type at a position."""
-        if not self._is_valid_position(coordinates):
+        if not (0 <= coordinates.row < self.rows and 0 <= coordinates.col < self.cols):
             return None
-        return self.grid[coordinates.row][coordinates.col]
+        return self._entity_at_bit(self._bit(coordinates))
+
+    def _bit(self, coordinates: Coordinates) -> int:
+        """Return the mask bit for a position (which must be on the board)."""
+        return 1 << (coordinates.row * self.cols + coordinates.col)
 
-    def _is_valid_position(self, coordinates: Coordinates) -> bool:
-        """Check if a position is within board bounds."""
-        return 0 <= coordinates.row < self.rows and 0 <= coordinates.col < self.cols
+    def _entity_at_bit(self, bit: int) -> EntityType:
+        if self._ships & bit:
+            return EntityType.SHIP
+        if self._hostages & bit:
+            return EntityType.HOSTAGE
+        return EntityType.EMPTY
 
     def ships_remaining(self) -> int:
         """Return the number of ships still on the board."""
-        return sum(1 for row in self.grid for cell in row if cell == EntityType.SHIP)
+        return self._ships.bit_count()
 
     def hostages_remaining(self) -> int:
         """Return the number of hostages still on the board."""
-        return sum(1 for row in self.grid for cell in row if cell == EntityType.HOSTAGE)
+        return self._hostages.bit_count()
 
     def check_endgame(self) -> Optional[EndgameResult]:
         """Return WIN, LOSE, or None depending on remaining ships and hostages."""
-        if self.ships_remaining() == 0:
+        if not self._ships:
             return EndgameResult.WIN
-        if self.hostages_remaining() == 0:
+        if not self._hostages:
             return EndgameResult.LOSE
         return None
 
@@ -178,7 +225,7 @@ class Board:
         Returns:
             True if deployment succeeded, False if position invalid or chaffing not allowed
         """
-        if not self._is_valid_position(coordinates):
+        if not (0 <= coordinates.row < self.rows and 0 <= coordinates.col < self.cols):
             return False
 
         if not self.can_deploy_chaff():
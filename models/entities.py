@@ -1,8 +1,13 @@
 """Game entities: Ships, Hostages, etc."""
 
+import functools
+import re
 from enum import Enum
 from dataclasses import dataclass
 
+# A column letter and a 1-based row number, like "B6" or " b 6 ".
+_COORDINATES_RE = re.compile(r"\s*([A-Za-z])\s*([0-9]+)\s*")
+
 
 class EntityType(Enum):
     """Types of entities that can exist on the board."""
@@ -27,30 +32,34 @@ class Coordinates:
     row: int
     col: int
 
+    # Coordinates are immutable, so each distinct string is parsed only once.
     @classmethod
+    @functools.lru_cache(maxsize=1024)
     def from_string(cls, value: str) -> "Coordinates":
         """Create Coordinates from a string like "B6" (column letter + 1-based row)."""
-        normalized = value.strip().upper()
-        if len(normalized) < 2:
+        match = _COORDINATES_RE.fullmatch(value)
+        if not match:
             raise ValueError(
-                "Coordinate string must be at least 2 characters, like 'A1'."
+                "Coordinate string must be a column letter A-Z followed by a row "
+                "number, like 'A1'."
             )
 
-        column_letter = normalized[0]
-        if column_letter < "A" or column_letter > "Z":
-            raise ValueError("Column must be a letter A-Z.")
+        column_letter, row_digits = match.groups()
+        row_number = int(row_digits)
+        if row_number < 1:
+            raise ValueError("Row number must be 1 or greater.")
 
-        try:
-            row_number = int(normalized[1:])
-        except ValueError as exc:
-            raise ValueError("Row must be a number after the column letter.") from exc
+        return cls(row=row_number - 1, col=ord(column_letter.upper()) - ord("A"))
 
+    @classmethod
+    def from_col_row(cls, column_letter: str, row_number: int) -> "Coordinates":
+        """Create Coordinates from a column letter and a 1-based row number, like ("B", 6)."""
+        column_letter = column_letter.strip().upper()
+        if len(column_letter) != 1 or column_letter < "A" or column_letter > "Z":
+            raise ValueError("Column must be a letter A-Z.")
         if row_number < 1:
             raise ValueError("Row number must be 1 or greater.")
-
-        row = row_number - 1
-        col = ord(column_letter) - ord("A")
-        return cls(row=row, col=col)
+        return cls(row=row_number - 1, col=ord(column_letter) - ord("A"))
 
     def __iter__(self):
         return iter((self.row, self.col))
@@ -61,7 +70,7 @@ class Coordinates:
         return f"{column_letter}{self.row + 1}"
 
 
-@dataclass
+@dataclass(slots=True)
 class Entity:
     """An entity on the board."""
 
@@ -1,70 +1,244 @@
+import asyncio
+import contextlib
 import datetime
+import httpx
+import importlib.util
 import json
+import logging
 import openai
+import os
+import random
+import re
 import time
-
-from typing import Any, cast, Dict, List, Optional, Tuple, Union
+import weakref
+
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from itertools import filterfalse
+from typing import (
+    Any,
+    Callable,
+    cast,
+    Dict,
+    Generator,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
 from openai._types import Omit, omit
 from openai.types.responses import ResponseTextConfigParam
 
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib json module.
+    orjson = None
+
+try:
+    import fastjsonschema
+except ImportError:  # fastjsonschema is optional; replies just go unvalidated.
+    fastjsonschema = None
+
+from utils.llm_cache import (
+    ResponseCache,
+    SemanticCache,
+    response_cache_key,
+    semantic_context_key,
+)
+from utils.rate_limit import AsyncRateLimiter
+
+logger = logging.getLogger(__name__)
+
 GPT_MODEL_CHEAP = "gpt-4.1-nano"
 GPT_MODEL_SMART = "gpt-4.1"
 
 GPT_RETRY_LIMIT = 5
-GPT_RETRY_BACKOFF_TIME_SECONDS = 30  # seconds
+GPT_RETRY_BACKOFF_BASE_SECONDS = 1.0  # doubles on every retry
+GPT_RETRY_BACKOFF_MAX_SECONDS = 60.0
+
+# Errors that won't go away by asking again; these are raised immediately
+# rather than burning through the retry budget.
+GPT_NON_RETRYABLE_ERRORS = (
+    openai.AuthenticationError,
+    openai.BadRequestError,
+    openai.PermissionDeniedError,
+)
 
 SYSTEM_ANNOUNCEMENT_MESSAGE: str = ""
 
+DATETIME_MESSAGE_PREFIX = "DATETIME:"
 
-def _gpt_submit(
-    messages: list,
-    openai_client: openai.OpenAI,
-    model: Optional[str] = None,
-    json_response: Optional[Union[bool, dict, str]] = None,
-) -> Union[str, dict, list]:
-    if not model:
-        model = GPT_MODEL_SMART
+_JSON_DECODER = json.JSONDecoder()
+
+# A comma right before a closing bracket; the most common way GPT breaks JSON.
+# String literals are matched (and kept as they are) first, so that a comma and
+# bracket inside a string value aren't mistaken for one.
+_TRAILING_COMMA_RE = re.compile(r'("(?:[^"\\]|\\.)*")|,\s*([}\]])')
 
-    efail = None
 
+def _remove_trailing_commas(text: str) -> str:
+    return _TRAILING_COMMA_RE.sub(lambda m: m.group(1) or m.group(2), text)
+
+
+# Errors that mean the reply was bad JSON (or didn't match the schema), in
+# which case the request is retried right away.
+JSON_REPLY_ERRORS: Tuple[type, ...] = (json.JSONDecodeError,)
+if fastjsonschema is not None:
+    JSON_REPLY_ERRORS += (fastjsonschema.JsonSchemaValueException,)
+
+# Compiled validators, keyed by the schema's canonical JSON.
+_JSON_SCHEMA_VALIDATORS: Dict[str, Callable[[Any], Any]] = {}
+
+# Shared cache for calls made with cache=True. Swap in a different backend
+# (e.g. JSONFileCacheBackend) to persist cached replies across runs.
+LLM_RESPONSE_CACHE = ResponseCache()
+
+# Connection pool settings for the HTTP client underneath the OpenAI client.
+# Keeping connections alive between calls saves a TCP + TLS handshake per request.
+# Keep as many idle connections as we allow open ones, so that a burst of
+# concurrent calls (the ally and the enemy together) doesn't throw any away.
+OPENAI_HTTP_LIMITS = httpx.Limits(
+    max_keepalive_connections=64,
+    max_connections=64,
+    keepalive_expiry=120,
+)
+OPENAI_HTTP_TIMEOUT = httpx.Timeout(1800.0, connect=10.0)
+
+# HTTP/2 lets concurrent requests share a single connection. httpx needs the
+# optional h2 package for it (pip install httpx[http2]), so only turn it on
+# when that is installed.
+OPENAI_HTTP2 = importlib.util.find_spec("h2") is not None
+
+_DEFAULT_OPENAI_CLIENT: Optional[openai.OpenAI] = None
+_DEFAULT_ASYNC_OPENAI_CLIENT: Optional[openai.AsyncOpenAI] = None
+
+
+def make_openai_client(api_key: Optional[str] = None, **kwargs) -> openai.OpenAI:
+    """Create an OpenAI client backed by a pooled, keep-alive (HTTP/2 if available) httpx.Client.
+
+    Create one of these and share it across all conversations; a fresh client
+    per conversation throws away the connection pool.
+    """
+    http_client = httpx.Client(
+        http2=OPENAI_HTTP2,
+        limits=OPENAI_HTTP_LIMITS,
+        timeout=OPENAI_HTTP_TIMEOUT,
+    )
+    return openai.OpenAI(api_key=api_key, http_client=http_client, **kwargs)
+
+
+def make_async_openai_client(
+    api_key: Optional[str] = None, **kwargs
+) -> openai.AsyncOpenAI:
+    """Create an AsyncOpenAI client on a pooled, keep-alive (HTTP/2 if available) httpx.AsyncClient.
+
+    With HTTP/2, concurrent requests (e.g. from asyncio.gather) share a single
+    connection instead of each opening its own.
+    """
+    http_client = httpx.AsyncClient(
+        http2=OPENAI_HTTP2,
+        limits=OPENAI_HTTP_LIMITS,
+        timeout=OPENAI_HTTP_TIMEOUT,
+    )
+    return openai.AsyncOpenAI(api_key=api_key, http_client=http_client, **kwargs)
+
+
+def get_default_openai_client() -> openai.OpenAI:
+    """Return the process-wide pooled OpenAI client, creating it on first use."""
+    global _DEFAULT_OPENAI_CLIENT
+    if _DEFAULT_OPENAI_CLIENT is None:
+        _DEFAULT_OPENAI_CLIENT = make_openai_client()
+    return _DEFAULT_OPENAI_CLIENT
+
+
+def get_default_async_openai_client() -> openai.AsyncOpenAI:
+    """Return the process-wide pooled AsyncOpenAI client, creating it on first use."""
+    global _DEFAULT_ASYNC_OPENAI_CLIENT
+    if _DEFAULT_ASYNC_OPENAI_CLIENT is None:
+        _DEFAULT_ASYNC_OPENAI_CLIENT = make_async_openai_client()
+    return _DEFAULT_ASYNC_OPENAI_CLIENT
+
+
+async def warm_up_openai_client(openai_client: openai.AsyncOpenAI) -> None:
+    """Open a pooled connection ahead of the first real request.
+
+    Run it as a background task at startup, while waiting on the user, so the
+    first LLM call doesn't pay for the DNS lookup and TLS handshake. Failures
+    are only logged; the first real request will report them properly.
+    """
+    try:
+        await openai_client.models.list()
+    except openai.OpenAIError as e:
+        logger.debug("Couldn't warm up the OpenAI connection: %s", e)
+
+
+def _fast_json_deepcopy(obj: Any) -> Any:
+    """Deep-copy a pure-JSON structure (dicts, lists, strings, numbers)."""
+    if orjson is not None:
+        return orjson.loads(orjson.dumps(obj))
+    return json.loads(json.dumps(obj))
+
+
+def _prepare_text_param(
+    json_response: Optional[Union[bool, dict, str]],
+) -> ResponseTextConfigParam | Omit:
+    """Translate our json_response convention into the OpenAI `text` parameter."""
     openai_text_param: ResponseTextConfigParam | Omit = omit
     if json_response:
         if isinstance(json_response, bool):
             openai_text_param = {"format": {"type": "json_object"}}
         elif isinstance(json_response, dict):
-            # Deep copy to avoid modifying caller's object
-            json_response = json.loads(json.dumps(json_response))
-
-            openai_text_param = cast(ResponseTextConfigParam, json_response)
-            # Check if format exists and has description before modifying
-            if (
-                "format" in openai_text_param
-                and "description" in openai_text_param["format"]
-            ):
+            # Only format.description gets modified, so shallow-copy down to it
+            # rather than deep-copying the caller's whole schema.
+            openai_text_param = cast(ResponseTextConfigParam, dict(json_response))
+            format_dict = openai_text_param.get("format")
+            if isinstance(format_dict, dict) and "description" in format_dict:
                 # Append instructions to the description to ensure JSON output.
-                format_dict = openai_text_param["format"]
-                if isinstance(format_dict, dict) and "description" in format_dict:
-                    format_dict["description"] += (
-                        "\n\nABSOLUTELY NO UNICODE ALLOWED. Only use typeable keyboard characters. "
-                        "Do not try to circumvent this rule with escape sequences, "
-                        'backslashes, or other tricks. Use double dashes (--), straight quotes ("), '
-                        "and single quotes (') instead of em-dashes, en-dashes, and curly versions."
-                    )
+                format_dict = dict(format_dict)
+                format_dict["description"] += (
+                    "\n\nABSOLUTELY NO UNICODE ALLOWED. Only use typeable keyboard characters. "
+                    "Do not try to circumvent this rule with escape sequences, "
+                    'backslashes, or other tricks. Use double dashes (--), straight quotes ("), '
+                    "and single quotes (') instead of em-dashes, en-dashes, and curly versions."
+                )
+                openai_text_param["format"] = cast(Any, format_dict)
         elif isinstance(json_response, str):
             openai_text_param = json.loads(json_response)
+    return openai_text_param
 
-    # Clear any existing datetime system message and add a fresh one.
-    messages = [
-        m
-        for m in messages
-        if not (
-            m.get("role") == "system"
-            and type(m.get("content")) is str
-            and m.get("content", "").startswith("DATETIME:")
-        )
-    ]
-    messages = [current_datetime_system_message()] + messages
+
+def _is_datetime_message(message: dict, _startswith=str.startswith) -> bool:
+    # Called once per message per submit, so check the cheap role test first
+    # and bind str.startswith as a default to skip the attribute lookup.
+    if message.get("role") != "system":
+        return False
+    content = message.get("content")
+    return content.__class__ is str and _startswith(content, DATETIME_MESSAGE_PREFIX)
+
+
+def _strip_datetime_messages(
+    messages: list, has_datetime_msg: Optional[bool] = None
+) -> list:
+    """Return the messages without any DATETIME system message.
+
+    Callers that know the list holds no DATETIME message (e.g. GptConversation,
+    which tracks this) pass has_datetime_msg=False to skip the scan and the copy.
+    """
+    if has_datetime_msg is False or not messages:
+        return messages
+    return list(filterfalse(_is_datetime_message, messages))
+
+
+def _add_system_preamble(messages: list) -> list:
+    """Add the system announcement (if any) up front and a fresh DATETIME message at the end.
+
+    The DATETIME message changes every second, so it goes last. Everything
+    before it then forms a stable prefix from call to call, which is what
+    OpenAI's automatic prompt caching needs in order to discount input tokens.
+    """
+    messages = messages + [current_datetime_system_message()]
     if SYSTEM_ANNOUNCEMENT_MESSAGE and SYSTEM_ANNOUNCEMENT_MESSAGE.strip():
         messages = [
             {
@@ -72,6 +246,259 @@ def _gpt_submit(
                 "content": SYSTEM_ANNOUNCEMENT_MESSAGE.strip(),
             }
         ] + messages
+    return messages
+
+
+def _resolve_response_cache(
+    cache: Union[bool, ResponseCache],
+) -> Optional[ResponseCache]:
+    if isinstance(cache, ResponseCache):
+        return cache
+    return LLM_RESPONSE_CACHE if cache else None
+
+
+def _semantic_cache_text(messages: list) -> Optional[str]:
+    """The text to embed for the semantic cache: the final message, if it's plain user text."""
+    if not messages:
+        return None
+    last = messages[-1]
+    if last.get("role") != "user" or type(last.get("content")) is not str:
+        return None
+    return last["content"]
+
+
+def embed_text(openai_client: openai.OpenAI, text: str, model: str) -> Optional[list]:
+    """Return the embedding of text, or None if the request fails."""
+    try:
+        return openai_client.embeddings.create(model=model, input=text).data[0].embedding
+    except openai.OpenAIError as e:
+        logger.warning("Embedding failed; skipping semantic cache: %s", e)
+        return None
+
+
+# The ally's security officer and the enemy both embed the player's message,
+# at the same time. Recent embeddings (including ones still in flight) are
+# shared per client, so each text is only embedded once.
+_ASYNC_EMBEDDING_MEMO_SIZE = 64
+_ASYNC_EMBEDDINGS: "weakref.WeakKeyDictionary[openai.AsyncOpenAI, OrderedDict[Tuple[str, str], asyncio.Future]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+async def _create_embedding_async(
+    openai_client: openai.AsyncOpenAI, text: str, model: str
+) -> Optional[list]:
+    try:
+        response = await openai_client.embeddings.create(model=model, input=text)
+        return response.data[0].embedding
+    except openai.OpenAIError as e:
+        logger.warning("Embedding failed; skipping semantic cache: %s", e)
+        return None
+
+
+async def embed_text_async(
+    openai_client: openai.AsyncOpenAI, text: str, model: str
+) -> Optional[list]:
+    """Async version of embed_text.
+
+    Callers asking for the same text and model share one request. Don't modify
+    the returned list.
+    """
+    memo = _ASYNC_EMBEDDINGS.setdefault(openai_client, OrderedDict())
+    key = (model, text)
+    future = memo.get(key)
+    if future is None:
+        future = asyncio.ensure_future(
+            _create_embedding_async(openai_client, text, model)
+        )
+        memo[key] = future
+        while len(memo) > _ASYNC_EMBEDDING_MEMO_SIZE:
+            memo.popitem(last=False)
+    else:
+        memo.move_to_end(key)
+
+    # Shielded, so that a cancelled caller doesn't cancel the others' request.
+    embedding = await asyncio.shield(future)
+    if embedding is None and memo.get(key) is future:
+        # Don't hold on to a failure; let the next caller try again.
+        del memo[key]
+    return embedding
+
+
+# One rate limiter per async client, created on first use. Set OPENAI_MAX_QPM
+# to cap how many requests per minute async submits may start.
+_ASYNC_RATE_LIMITERS: "weakref.WeakKeyDictionary[openai.AsyncOpenAI, Optional[AsyncRateLimiter]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _async_rate_limiter(openai_client: openai.AsyncOpenAI) -> Optional[AsyncRateLimiter]:
+    if openai_client not in _ASYNC_RATE_LIMITERS:
+        max_qpm = os.getenv("OPENAI_MAX_QPM")
+        _ASYNC_RATE_LIMITERS[openai_client] = (
+            AsyncRateLimiter(float(max_qpm)) if max_qpm else None
+        )
+    return _ASYNC_RATE_LIMITERS[openai_client]
+
+
+# Likewise, set OPENAI_MAX_CONCURRENCY to cap how many async requests may be in
+# flight at once on each client.
+_ASYNC_CONCURRENCY_LIMITS: "weakref.WeakKeyDictionary[openai.AsyncOpenAI, Optional[asyncio.Semaphore]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _async_concurrency_limit(
+    openai_client: openai.AsyncOpenAI,
+) -> Union[asyncio.Semaphore, contextlib.nullcontext]:
+    if openai_client not in _ASYNC_CONCURRENCY_LIMITS:
+        max_concurrency = os.getenv("OPENAI_MAX_CONCURRENCY")
+        _ASYNC_CONCURRENCY_LIMITS[openai_client] = (
+            asyncio.Semaphore(int(max_concurrency)) if max_concurrency else None
+        )
+    return _ASYNC_CONCURRENCY_LIMITS[openai_client] or contextlib.nullcontext()
+
+
+def _retry_delay_seconds(error: openai.OpenAIError, iretry: int) -> float:
+    """How long to wait before the next attempt: Retry-After if given, else backoff."""
+    response = getattr(error, "response", None)
+    if response is not None:
+        retry_after = response.headers.get("retry-after")
+        if retry_after:
+            try:
+                return min(GPT_RETRY_BACKOFF_MAX_SECONDS, float(retry_after))
+            except ValueError:
+                pass  # Could be an HTTP date; fall back to our own backoff.
+
+    # Exponential backoff with jitter, so that concurrent callers don't all
+    # come back at the same instant.
+    delay = min(
+        GPT_RETRY_BACKOFF_MAX_SECONDS, GPT_RETRY_BACKOFF_BASE_SECONDS * (2**iretry)
+    )
+    return delay * random.uniform(0.5, 1.5)
+
+
+def _llmresponse_text(llmresponse: Any) -> str:
+    """Extract the reply text from an OpenAI response, reporting any API-side problems."""
+    if llmresponse.error:
+        logger.error("OpenAI API returned an error: %s", llmresponse.error)
+    if llmresponse.incomplete_details:
+        logger.error(
+            "OpenAI API returned incomplete details: %s",
+            llmresponse.incomplete_details,
+        )
+    usage = getattr(llmresponse, "usage", None)
+    if usage is not None:
+        # Shows whether OpenAI's prompt cache is hitting on our static prefixes.
+        details = getattr(usage, "input_tokens_details", None)
+        logger.debug(
+            "OpenAI usage: %s input tokens (%s cached), %s output tokens",
+            usage.input_tokens,
+            getattr(details, "cached_tokens", 0),
+            usage.output_tokens,
+        )
+    return llmresponse.output_text.strip()
+
+
+def _decode_json_reply(llmreply: str) -> Union[dict, list]:
+    """Decode the JSON object (a dictionary or a list) at the start of an LLM reply."""
+    # We'll use raw_decode rather than loads to parse it, because
+    # GPT has a habit of concatenating multiple JSON objects
+    # for some reason (raw_decode will stop at the end of the first object,
+    # whereas loads will raise an error if there's any trailing text).
+    if orjson is not None:
+        # Fast path for the usual case of a reply that is exactly one JSON value.
+        try:
+            return orjson.loads(llmreply)
+        except orjson.JSONDecodeError:
+            pass
+    try:
+        (llmobj, _) = _JSON_DECODER.raw_decode(llmreply)
+    except json.JSONDecodeError:
+        # Patch up trailing commas before giving up and spending a retry.
+        repaired = _remove_trailing_commas(llmreply)
+        if repaired == llmreply:
+            raise
+        (llmobj, _) = _JSON_DECODER.raw_decode(repaired)
+    llmobj: Union[dict, list] = llmobj
+    return llmobj
+
+
+def _validate_json_reply(openai_text_param: Any, llmobj: Any) -> None:
+    """Check a decoded reply against the request's JSON schema, if there is one.
+
+    Raises fastjsonschema.JsonSchemaValueException on a mismatch. Does nothing
+    if fastjsonschema isn't installed.
+    """
+    if fastjsonschema is None or not isinstance(openai_text_param, dict):
+        return
+    format_dict = openai_text_param.get("format")
+    schema = format_dict.get("schema") if isinstance(format_dict, dict) else None
+    if not schema:
+        return
+    _json_schema_validator(schema)(llmobj)
+
+
+def _json_schema_validator(schema: dict) -> Callable[[Any], Any]:
+    """Return the compiled fastjsonschema validator for a schema, compiling it on first use."""
+    schema_key = json.dumps(schema, sort_keys=True)
+    validate = _JSON_SCHEMA_VALIDATORS.get(schema_key)
+    if validate is None:
+        try:
+            validate = fastjsonschema.compile(schema)
+        except fastjsonschema.JsonSchemaDefinitionException as e:
+            logger.warning(
+                "Can't compile JSON schema; replies won't be validated: %s", e
+            )
+            validate = lambda obj: obj
+        _JSON_SCHEMA_VALIDATORS[schema_key] = validate
+    return validate
+
+
+def _gpt_submit(
+    messages: list,
+    openai_client: openai.OpenAI,
+    model: Optional[str] = None,
+    json_response: Optional[Union[bool, dict, str]] = None,
+    cache: Union[bool, ResponseCache] = False,
+    semantic_cache: Optional[SemanticCache] = None,
+    has_datetime_msg: Optional[bool] = None,
+    prompt_cache_key: Optional[str] = None,
+) -> Union[str, dict, list]:
+    if not model:
+        model = GPT_MODEL_SMART
+
+    efail = None
+
+    openai_text_param = _prepare_text_param(json_response)
+    messages = _strip_datetime_messages(messages, has_datetime_msg)
+
+    # Identical requests are answered from the cache when the caller opts in.
+    # The key is computed without the DATETIME message, which changes every second.
+    response_cache = _resolve_response_cache(cache)
+    cache_key = None
+    if response_cache is not None:
+        cache_key = response_cache_key(model, messages, json_response)
+        cached_reply = response_cache.get(cache_key)
+        if cached_reply is not None:
+            return cached_reply
+
+    # Near-duplicate prompts (same context, similar final user message) can be
+    # answered from the semantic cache. Only plain-text replies are cached this way.
+    semantic_context = None
+    semantic_embedding = None
+    semantic_text = _semantic_cache_text(messages)
+    if semantic_cache is not None and not json_response and semantic_text:
+        semantic_context = semantic_context_key(model, messages[:-1])
+        semantic_embedding = embed_text(
+            openai_client, semantic_text, semantic_cache.embedding_model
+        )
+        if semantic_embedding is not None:
+            cached_reply = semantic_cache.query(semantic_embedding, semantic_context)
+            if cached_reply is not None:
+                return cached_reply
+
+    messages = _add_system_preamble(messages)
 
     for iretry in range(GPT_RETRY_LIMIT):
         llmreply = ""
@@ -81,42 +508,155 @@ def _gpt_submit(
                 model=model,
                 input=messages,
                 text=openai_text_param,
+                prompt_cache_key=prompt_cache_key or omit,
             )
-            if llmresponse.error:
-                print("ERROR: OpenAI API returned an error:", llmresponse.error)
-            if llmresponse.incomplete_details:
-                print(
-                    "ERROR: OpenAI API returned incomplete details:",
-                    llmresponse.incomplete_details,
+            llmreply = _llmresponse_text(llmresponse)
+            if not json_response:
+                llmobj: Union[str, dict, list] = f"{llmreply}"
+            else:
+                # If we got here, then we expect a JSON response,
+                # which will be a dictionary or a list.
+                llmobj = _decode_json_reply(llmreply)
+                _validate_json_reply(openai_text_param, llmobj)
+
+            if response_cache is not None and cache_key is not None:
+                response_cache.set(cache_key, llmobj)
+            if semantic_cache is not None and semantic_embedding is not None:
+                semantic_cache.add(semantic_embedding, llmobj, semantic_context or "")
+            return llmobj
+        except GPT_NON_RETRYABLE_ERRORS:
+            raise
+        except openai.OpenAIError as e:
+            efail = e
+            delay = _retry_delay_seconds(e, iretry)
+            logger.warning(
+                "OpenAI API error: %s. Retrying (attempt %d of %d) in %.1f seconds...",
+                e,
+                iretry + 1,
+                GPT_RETRY_LIMIT,
+                delay,
+            )
+            time.sleep(delay)
+        except JSON_REPLY_ERRORS as e:
+            efail = e
+            logger.warning(
+                "JSON decode error: %s. Retrying (attempt %d of %d) immediately...",
+                e,
+                iretry + 1,
+                GPT_RETRY_LIMIT,
+            )
+            # The raw reply can be long, so it's only shown when debugging.
+            logger.debug("Raw text of LLM reply:\n%s", llmreply)
+
+    # Propagate the last error after all retries
+    if efail:
+        raise efail
+    raise ValueError("Unknown error occurred in _gpt_helpers")
+
+
+async def _gpt_submit_async(
+    messages: list,
+    openai_client: openai.AsyncOpenAI,
+    model: Optional[str] = None,
+    json_response: Optional[Union[bool, dict, str]] = None,
+    cache: Union[bool, ResponseCache] = False,
+    semantic_cache: Optional[SemanticCache] = None,
+    has_datetime_msg: Optional[bool] = None,
+    prompt_cache_key: Optional[str] = None,
+) -> Union[str, dict, list]:
+    """Async twin of _gpt_submit, for fanning out many requests with asyncio.gather.
+
+    Callers that launch a large number of these at once should set
+    OPENAI_MAX_CONCURRENCY and/or OPENAI_MAX_QPM, so that they don't blow
+    through the API rate limits.
+    """
+    if not model:
+        model = GPT_MODEL_SMART
+
+    efail = None
+
+    openai_text_param = _prepare_text_param(json_response)
+    messages = _strip_datetime_messages(messages, has_datetime_msg)
+
+    # Identical requests are answered from the cache when the caller opts in.
+    # The key is computed without the DATETIME message, which changes every second.
+    response_cache = _resolve_response_cache(cache)
+    cache_key = None
+    if response_cache is not None:
+        cache_key = response_cache_key(model, messages, json_response)
+        cached_reply = response_cache.get(cache_key)
+        if cached_reply is not None:
+            return cached_reply
+
+    # Near-duplicate prompts (same context, similar final user message) can be
+    # answered from the semantic cache. Only plain-text replies are cached this way.
+    semantic_context = None
+    semantic_embedding = None
+    semantic_text = _semantic_cache_text(messages)
+    if semantic_cache is not None and not json_response and semantic_text:
+        semantic_context = semantic_context_key(model, messages[:-1])
+        semantic_embedding = await embed_text_async(
+            openai_client, semantic_text, semantic_cache.embedding_model
+        )
+        if semantic_embedding is not None:
+            cached_reply = semantic_cache.query(semantic_embedding, semantic_context)
+            if cached_reply is not None:
+                return cached_reply
+
+    rate_limiter = _async_rate_limiter(openai_client)
+    concurrency_limit = _async_concurrency_limit(openai_client)
+    messages = _add_system_preamble(messages)
+
+    for iretry in range(GPT_RETRY_LIMIT):
+        llmreply = ""
+        try:
+            if rate_limiter is not None:
+                await rate_limiter.acquire()
+            # Attempt to get a response from the OpenAI API
+            async with concurrency_limit:
+                llmresponse = await openai_client.responses.create(
+                    model=model,
+                    input=messages,
+                    text=openai_text_param,
+                    prompt_cache_key=prompt_cache_key or omit,
                 )
-            llmreply = llmresponse.output_text.strip()
+            llmreply = _llmresponse_text(llmresponse)
             if not json_response:
-                return f"{llmreply}"
-
-            # If we got here, then we expect a JSON response,
-            # which will be a dictionary or a list.
-            # We'll use raw_decode rather than loads to parse it, because
-            # GPT has a habit of concatenating multiple JSON objects
-            # for some reason (raw_decode will stop at the end of the first object,
-            # whereas loads will raise an error if there's any trailing text).
-            (llmobj, _) = json.JSONDecoder().raw_decode(llmreply)
-            llmobj: Union[dict, list] = llmobj
+                llmobj: Union[str, dict, list] = f"{llmreply}"
+            else:
+                # If we got here, then we expect a JSON response,
+                # which will be a dictionary or a list.
+                llmobj = _decode_json_reply(llmreply)
+                _validate_json_reply(openai_text_param, llmobj)
+
+            if response_cache is not None and cache_key is not None:
+                response_cache.set(cache_key, llmobj)
+            if semantic_cache is not None and semantic_embedding is not None:
+                semantic_cache.add(semantic_embedding, llmobj, semantic_context or "")
             return llmobj
+        except GPT_NON_RETRYABLE_ERRORS:
+            raise
         except openai.OpenAIError as e:
             efail = e
-            print(
-                f"OpenAI API error:\n\n{e}.\n\n"
-                f"Retrying (attempt {iretry + 1} of {GPT_RETRY_LIMIT}) "
-                f"in {GPT_RETRY_BACKOFF_TIME_SECONDS} seconds..."
+            delay = _retry_delay_seconds(e, iretry)
+            logger.warning(
+                "OpenAI API error: %s. Retrying (attempt %d of %d) in %.1f seconds...",
+                e,
+                iretry + 1,
+                GPT_RETRY_LIMIT,
+                delay,
             )
-            time.sleep(GPT_RETRY_BACKOFF_TIME_SECONDS)
-        except json.JSONDecodeError as e:
+            await asyncio.sleep(delay)
+        except JSON_REPLY_ERRORS as e:
             efail = e
-            print(
-                f"JSON decode error:\n\n{e}.\n\n"
-                f"Raw text of LLM Reply:\n{llmreply}\n\n"
-                f"Retrying (attempt {iretry + 1} of {GPT_RETRY_LIMIT}) immediately..."
+            logger.warning(
+                "JSON decode error: %s. Retrying (attempt %d of %d) immediately...",
+                e,
+                iretry + 1,
+                GPT_RETRY_LIMIT,
             )
+            # The raw reply can be long, so it's only shown when debugging.
+            logger.debug("Raw text of LLM reply:\n%s", llmreply)
 
     # Propagate the last error after all retries
     if efail:
@@ -124,8 +664,256 @@ def _gpt_submit(
     raise ValueError("Unknown error occurred in _gpt_helpers")
 
 
+def _gpt_submit_stream(
+    messages: list,
+    openai_client: openai.OpenAI,
+    model: Optional[str] = None,
+    json_response: Optional[Union[bool, dict, str]] = None,
+    has_datetime_msg: Optional[bool] = None,
+    prompt_cache_key: Optional[str] = None,
+) -> Generator[str, None, Union[str, dict, list]]:
+    """Streaming version of _gpt_submit. Yields text deltas as they arrive.
+
+    The generator's return value (StopIteration.value) is the complete reply,
+    decoded as JSON if json_response is set. There are no retries, since a
+    partially consumed stream can't be replayed.
+    """
+    if not model:
+        model = GPT_MODEL_SMART
+
+    openai_text_param = _prepare_text_param(json_response)
+    messages = _add_system_preamble(
+        _strip_datetime_messages(messages, has_datetime_msg)
+    )
+
+    with openai_client.responses.stream(
+        model=model,
+        input=messages,
+        text=openai_text_param,
+        prompt_cache_key=prompt_cache_key or omit,
+    ) as stream:
+        for event in stream:
+            if event.type == "response.output_text.delta":
+                yield event.delta
+        llmresponse = stream.get_final_response()
+
+    llmreply = _llmresponse_text(llmresponse)
+    if not json_response:
+        return llmreply
+    llmobj = _decode_json_reply(llmreply)
+    _validate_json_reply(openai_text_param, llmobj)
+    return llmobj
+
+
+async def _gpt_submit_stream_async(
+    messages: list,
+    openai_client: openai.AsyncOpenAI,
+    on_delta: Callable[[str], None],
+    model: Optional[str] = None,
+    json_response: Optional[Union[bool, dict, str]] = None,
+    has_datetime_msg: Optional[bool] = None,
+    prompt_cache_key: Optional[str] = None,
+) -> Union[str, dict, list]:
+    """Async streaming version of _gpt_submit. Calls on_delta with each text delta.
+
+    Returns the complete reply, decoded as JSON if json_response is set. Like
+    _gpt_submit_stream, there are no retries.
+    """
+    if not model:
+        model = GPT_MODEL_SMART
+
+    openai_text_param = _prepare_text_param(json_response)
+    messages = _add_system_preamble(
+        _strip_datetime_messages(messages, has_datetime_msg)
+    )
+
+    rate_limiter = _async_rate_limiter(openai_client)
+    if rate_limiter is not None:
+        await rate_limiter.acquire()
+    async with _async_concurrency_limit(openai_client):
+        async with openai_client.responses.stream(
+            model=model,
+            input=messages,
+            text=openai_text_param,
+            prompt_cache_key=prompt_cache_key or omit,
+        ) as stream:
+            async for event in stream:
+                if event.type == "response.output_text.delta":
+                    on_delta(event.delta)
+            llmresponse = await stream.get_final_response()
+
+    llmreply = _llmresponse_text(llmresponse)
+    if not json_response:
+        return llmreply
+    llmobj = _decode_json_reply(llmreply)
+    _validate_json_reply(openai_text_param, llmobj)
+    return llmobj
+
+
+GPT_BATCH_TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+def _batch_response_text(body: dict) -> str:
+    """Collect the output text from a raw Responses API body (as found in batch output)."""
+    texts = []
+    for item in body.get("output") or []:
+        if item.get("type") != "message":
+            continue
+        for part in item.get("content") or []:
+            if part.get("type") == "output_text":
+                texts.append(part.get("text", ""))
+    return "".join(texts).strip()
+
+
+def gpt_submit_batch(
+    list_of_messages: List[list],
+    openai_client: openai.OpenAI,
+    model: Optional[str] = None,
+    json_response: Optional[Union[bool, dict, str]] = None,
+    poll_interval: float = 30.0,
+) -> List[Optional[Union[str, dict, list]]]:
+    """Submit many independent conversations through the OpenAI Batch API.
+
+    The Batch API costs half as much as regular calls but can take minutes (up
+    to 24 hours) to finish, so only use this for work that isn't latency-sensitive.
+    Blocks until the batch is done. Returns one reply per conversation, in input
+    order; a reply is None if that particular request failed.
+    """
+    if not model:
+        model = GPT_MODEL_SMART
+
+    openai_text_param = _prepare_text_param(json_response)
+
+    lines = []
+    for i, messages in enumerate(list_of_messages):
+        body: Dict[str, Any] = {
+            "model": model,
+            "input": _add_system_preamble(_strip_datetime_messages(list(messages))),
+        }
+        if openai_text_param is not omit:
+            body["text"] = openai_text_param
+        request = {
+            "custom_id": f"req-{i}",
+            "method": "POST",
+            "url": "/v1/responses",
+            "body": body,
+        }
+        lines.append(json.dumps(request))
+
+    batch_file = openai_client.files.create(
+        file=("batch.jsonl", "\n".join(lines).encode("utf-8")),
+        purpose="batch",
+    )
+    batch = openai_client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/responses",
+        completion_window="24h",
+    )
+    while batch.status not in GPT_BATCH_TERMINAL_STATUSES:
+        time.sleep(poll_interval)
+        batch = openai_client.batches.retrieve(batch.id)
+
+    if batch.status != "completed":
+        raise ValueError(f"Batch {batch.id} ended with status {batch.status}")
+
+    results: List[Optional[Union[str, dict, list]]] = [None] * len(list_of_messages)
+    if not batch.output_file_id:
+        return results
+
+    output = openai_client.files.content(batch.output_file_id).text
+    for line in output.splitlines():
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        index = int(record["custom_id"].removeprefix("req-"))
+        response = record.get("response") or {}
+        if record.get("error") or response.get("status_code") != 200:
+            logger.warning("Batch request %s failed: %s", record["custom_id"], record)
+            continue
+
+        llmreply = _batch_response_text(response.get("body") or {})
+        if not json_response:
+            results[index] = llmreply
+            continue
+        try:
+            results[index] = _decode_json_reply(llmreply)
+        except json.JSONDecodeError as e:
+            logger.warning(
+                "JSON decode error in batch request %s: %s", record["custom_id"], e
+            )
+            logger.debug("Raw text of LLM reply:\n%s", llmreply)
+    return results
+
+
+@dataclass
+class _SchemaTupleParts:
+    """The pieces of a tuple in our schema shorthand, e.g. ("desc", ["a", "b"])."""
+
+    value: Any
+    description: str = ""
+    enum: list = field(default_factory=list)
+    numrange: tuple = (None, None)
+
+
+def _handle_value_item(item: Any, parts: _SchemaTupleParts) -> None:
+    # Anything we don't otherwise recognize is the schema value.
+    parts.value = item
+
+
+def _handle_str_item(item: str, parts: _SchemaTupleParts) -> None:
+    # A non-empty string is a description.
+    parts.description = item
+
+
+def _handle_list_item(item: list, parts: _SchemaTupleParts) -> None:
+    # A list of length >= 2 whose members are all strings is an enum.
+    if len(item) >= 2 and all(type(i) is str for i in item):
+        parts.enum = item
+    else:
+        parts.value = item
+
+
+def _handle_tuple_item(item: tuple, parts: _SchemaTupleParts) -> None:
+    # A pair with at least one number in it is a numeric range.
+    if len(item) == 2 and (
+        isinstance(item[0], (float, int)) or isinstance(item[1], (float, int))
+    ):
+        parts.numrange = item
+    else:
+        parts.value = item
+
+
+_SCHEMA_TUPLE_ITEM_HANDLERS: Dict[type, Callable[[Any, _SchemaTupleParts], None]] = {
+    str: _handle_str_item,
+    list: _handle_list_item,
+    tuple: _handle_tuple_item,
+}
+
+
+# Converted schemas, keyed by (repr(schema), name, description). Agents
+# rebuild the same schema literal on every call, so after the first call this
+# is a dictionary lookup instead of a full conversion.
+_SCHEMA_FORMAT_CACHE: Dict[Tuple[str, str, str], dict] = {}
+
+
 def JSONSchemaFormat(schema: Any, *, name: str, description: str):
     """A convenience function that allows us to easily create JSON schema formats."""
+    # repr() rather than a JSON dump, because tuples and lists mean different
+    # things in our schema shorthand and the schema contains Python types.
+    cache_key = (repr(schema), name, description)
+    cached = _SCHEMA_FORMAT_CACHE.get(cache_key)
+    if cached is None:
+        cached = _build_json_schema_format(schema, name=name, description=description)
+        _SCHEMA_FORMAT_CACHE[cache_key] = cached
+        if fastjsonschema is not None:
+            # Compile the reply validator now, so that formats built at import
+            # time don't pay for it on their first reply.
+            _json_schema_validator(cached["format"]["schema"])
+    # Callers own the returned dict, so hand out a copy.
+    return _fast_json_deepcopy(cached)
+
+
+def _build_json_schema_format(schema: Any, *, name: str, description: str) -> dict:
     retval = {
         "format": {
             "type": "json_schema",
@@ -149,46 +937,19 @@ def JSONSchemaFormat(schema: Any, *, name: str, description: str):
         # One of these elements will be a string. The other element will be a list of strings.
         # The third element will be the subschema's value. These elements can occur in any order.
         # Oh, it can also be a pair of numerical values, which represent min and max ranges.
-        subschema_description = ""
-        subschema_enum = []
-        subschema_numrange = (None, None)
-        subschema_value = subschema
+        parts = _SchemaTupleParts(value=subschema)
         if isinstance(subschema, tuple):
             for item in subschema:
                 if not item:
                     # If the item is falsy, then it's a data type placeholder.
-                    subschema_value = item
+                    parts.value = item
                     continue
-
-                # If it's a string and it wasn't falsy, then assume it's a description.
-                if isinstance(item, str):
-                    subschema_description = item
-                    continue
-
-                # If it's a list of length >= 2 and all list members are strings, then assume it's an enum.
-                if (
-                    isinstance(item, list)
-                    and len(item) >= 2
-                    and all(isinstance(i, str) for i in item)
-                ):
-                    subschema_enum = item
-                    continue
-
-                # If it's a tuple of length 2 and at least one element is a float or int,
-                # then assume it's a numeric range.
-                if (
-                    isinstance(item, tuple)
-                    and len(item) == 2
-                    and (
-                        isinstance(item[0], (float, int))
-                        or isinstance(item[1], (float, int))
-                    )
-                ):
-                    subschema_numrange = item
-                    continue
-
-                # At this point, we have to assume that the item is the schema value.
-                subschema_value = item
+                handler = _SCHEMA_TUPLE_ITEM_HANDLERS.get(type(item), _handle_value_item)
+                handler(item, parts)
+        subschema_description = parts.description
+        subschema_enum = parts.enum
+        subschema_numrange = parts.numrange
+        subschema_value = parts.value
 
         if isinstance(subschema_value, tuple):
             # We might be able to infer its type by its enum or range.
@@ -281,60 +1042,134 @@ def JSONSchemaFormat(schema: Any, *, name: str, description: str):
     return retval
 
 
+# The DATETIME message only has 1-second resolution, so it's rebuilt at most
+# once per second and shared between all submits in that second.
+_last_datetime_timestamp = 0
+_last_datetime_message: Dict[str, str] = {}
+
+
 def current_datetime_system_message() -> Dict[str, str]:
-    current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    retval = {
-        "role": "system",
-        "content": f"DATETIME: The current date and time is {current_time}",
-    }
-    return retval
+    """Return the DATETIME system message. The dict is shared; don't mutate it."""
+    global _last_datetime_timestamp, _last_datetime_message
+    now = time.time()
+    if int(now) != _last_datetime_timestamp or not _last_datetime_message:
+        current_time = datetime.datetime.fromtimestamp(now).strftime(
+            "%Y-%m-%d %H:%M:%S"
+        )
+        _last_datetime_message = {
+            "role": "system",
+            "content": f"{DATETIME_MESSAGE_PREFIX} The current date and time is {current_time}",
+        }
+        _last_datetime_timestamp = int(now)
+    return _last_datetime_message
+
+
+def _message_content_str(content: Any) -> str:
+    """Coerce message content to the string the API expects."""
+    if type(content) is str:
+        return content
+    if isinstance(content, dict):
+        return json.dumps(content, indent=2)
+    return str(content)
 
 
 class GptConversation(list):
-    """A conversation class that behaves like a list but with additional methods for managing chat messages."""
+    """A conversation class that behaves like a list but with additional methods for managing chat messages.
+
+    Conversations are cheap; OpenAI clients are not. Reuse one client (e.g. from
+    get_default_openai_client) across many conversations so that they all draw
+    on the same HTTP connection pool.
+
+    Treat a conversation as append-only: the add_* and submit* methods only ever
+    append, and replies are recorded as assistant messages without being
+    rewritten. That way each request starts with the previous request's exact
+    input, which OpenAI's prompt cache can reuse. Editing or inserting messages
+    earlier in the list throws that away.
+    """
 
     def __init__(
         self,
         messages=None,
         *,
-        openai_client: Optional[openai.OpenAI] = None,
+        openai_client: Optional[Union[openai.OpenAI, openai.AsyncOpenAI]] = None,
+        async_openai_client: Optional[openai.AsyncOpenAI] = None,
         model: Optional[str] = None,
+        prompt_cache_key: Optional[str] = None,
+        owns_client: bool = False,
     ):
-        """Initialize conversation with optional list of messages."""
+        """Initialize conversation with optional list of messages.
+
+        The conversation can hold a sync client (used by submit) and/or an async
+        client (used by asubmit). An AsyncOpenAI passed as openai_client is
+        treated as the async client.
+
+        Clients are normally shared, so close() leaves them open. Pass
+        owns_client=True for a sync client made just for this conversation,
+        to have close() (and leaving a with block) close it.
+
+        prompt_cache_key is sent with every request. Give conversations that
+        share a long static prefix the same key, so that OpenAI routes them to
+        the same prompt cache.
+        """
         super().__init__(messages or [])
+        if isinstance(openai_client, openai.AsyncOpenAI):
+            async_openai_client = async_openai_client or openai_client
+            openai_client = None
         self.openai_client = openai_client
+        self.async_openai_client = async_openai_client
         self.model = model
+        self.prompt_cache_key = prompt_cache_key
+        self._owns_client = owns_client
 
         self.last_reply = None
 
+        # Lets submit skip scanning for a stale DATETIME message. Messages added
+        # through add_message/assign_messages keep this up to date.
+        self._has_datetime_msg = any(_is_datetime_message(m) for m in self)
+
+    def __enter__(self) -> "GptConversation":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close the conversation's own sync client (see owns_client).
+
+        A shared client (such as the default one) is left open for everyone else.
+        """
+        if self._owns_client and self.openai_client is not None:
+            self.openai_client.close()
+
     def assign_messages(self, messages=None):
-        """Assign a list of messages to the conversation."""
+        """Assign a list of messages to the conversation.
+
+        Message contents are coerced to strings the same way add_message does it.
+        """
         self.clear()
+        self._has_datetime_msg = False
         if messages:
-            self.extend(messages)
+            self.add_messages((m.get("role"), m.get("content")) for m in messages)
         return self
 
     def clone(self):
         """Create a copy of the conversation."""
         return GptConversation(
-            messages=json.loads(json.dumps(list(self))),
+            messages=_fast_json_deepcopy(list(self)),
             openai_client=self.openai_client,
+            async_openai_client=self.async_openai_client,
             model=self.model,
+            prompt_cache_key=self.prompt_cache_key,
         )
 
-    def submit(
+    def _prepare_submit(
         self,
-        message: Optional[Union[str, dict]] = None,
-        role: Optional[str] = "user",
-        *,
-        model: Optional[str] = None,
-        json_response: Optional[Union[bool, dict, str]] = None,
-    ) -> Any:
-        """Submit a message to the OpenAI API and return the response."""
-        if not self.openai_client:
-            raise ValueError(
-                "OpenAI client is not set. Please provide an OpenAI client."
-            )
+        message: Optional[Union[str, dict]],
+        role: Optional[str],
+        model: Optional[str],
+        json_response: Optional[Union[bool, dict, str]],
+    ) -> Tuple[str, Optional[Union[bool, dict, str]]]:
+        """Add the outgoing message (if any) and resolve the model and json_response."""
         if not model:
             model = self.model or GPT_MODEL_SMART
 
@@ -353,12 +1188,145 @@ class GptConversation(list):
                 role=role or "user",
                 content=message,
             )
+        return model, json_response
+
+    def submit(
+        self,
+        message: Optional[Union[str, dict]] = None,
+        role: Optional[str] = "user",
+        *,
+        model: Optional[str] = None,
+        json_response: Optional[Union[bool, dict, str]] = None,
+        cache: Union[bool, ResponseCache] = False,
+        semantic_cache: Optional[SemanticCache] = None,
+    ) -> Any:
+        """Submit a message to the OpenAI API and return the response.
+
+        Pass cache=True (or a ResponseCache) to reuse the reply of an identical
+        earlier request instead of calling the API again. Pass a SemanticCache to
+        also reuse replies to near-duplicate plain-text user messages.
+        """
+        if not self.openai_client:
+            raise ValueError(
+                "OpenAI client is not set. Please provide an OpenAI client."
+            )
+        model, json_response = self._prepare_submit(
+            message, role, model, json_response
+        )
 
         llmreply = _gpt_submit(
             messages=self.to_dict_list(),
             openai_client=self.openai_client,
             json_response=json_response,
             model=model,
+            cache=cache,
+            semantic_cache=semantic_cache,
+            has_datetime_msg=self._has_datetime_msg,
+            prompt_cache_key=self.prompt_cache_key,
+        )
+
+        self.add_assistant_message(llmreply)
+        self.last_reply = llmreply
+        return llmreply
+
+    async def asubmit(
+        self,
+        message: Optional[Union[str, dict]] = None,
+        role: Optional[str] = "user",
+        *,
+        model: Optional[str] = None,
+        json_response: Optional[Union[bool, dict, str]] = None,
+        cache: Union[bool, ResponseCache] = False,
+        semantic_cache: Optional[SemanticCache] = None,
+    ) -> Any:
+        """Async version of submit. Requires an async OpenAI client."""
+        if not self.async_openai_client:
+            raise ValueError(
+                "Async OpenAI client is not set. Please provide an AsyncOpenAI client."
+            )
+        model, json_response = self._prepare_submit(
+            message, role, model, json_response
+        )
+
+        llmreply = await _gpt_submit_async(
+            messages=self.to_dict_list(),
+            openai_client=self.async_openai_client,
+            json_response=json_response,
+            model=model,
+            cache=cache,
+            semantic_cache=semantic_cache,
+            has_datetime_msg=self._has_datetime_msg,
+            prompt_cache_key=self.prompt_cache_key,
+        )
+
+        self.add_assistant_message(llmreply)
+        self.last_reply = llmreply
+        return llmreply
+
+    def stream_submit(
+        self,
+        message: Optional[Union[str, dict]] = None,
+        role: Optional[str] = "user",
+        *,
+        model: Optional[str] = None,
+        json_response: Optional[Union[bool, dict, str]] = None,
+    ) -> Generator[str, None, Any]:
+        """Like submit, but yields the reply's text deltas as they arrive.
+
+        The assistant message is added (and last_reply set) once the stream
+        has been consumed to the end.
+        """
+        if not self.openai_client:
+            raise ValueError(
+                "OpenAI client is not set. Please provide an OpenAI client."
+            )
+        model, json_response = self._prepare_submit(
+            message, role, model, json_response
+        )
+
+        llmreply = yield from _gpt_submit_stream(
+            messages=self.to_dict_list(),
+            openai_client=self.openai_client,
+            json_response=json_response,
+            model=model,
+            has_datetime_msg=self._has_datetime_msg,
+            prompt_cache_key=self.prompt_cache_key,
+        )
+
+        self.add_assistant_message(llmreply)
+        self.last_reply = llmreply
+        return llmreply
+
+    async def astream_submit(
+        self,
+        message: Optional[Union[str, dict]] = None,
+        role: Optional[str] = "user",
+        *,
+        on_delta: Callable[[str], None],
+        model: Optional[str] = None,
+        json_response: Optional[Union[bool, dict, str]] = None,
+    ) -> Any:
+        """Like asubmit, but calls on_delta with the reply's text deltas as they arrive.
+
+        Use this for replies that are shown to a person, who can start reading
+        before the reply is complete. Requires an async OpenAI client.
+        """
+        if not self.async_openai_client:
+            raise ValueError(
+                "Async OpenAI client is not set. Please provide an AsyncOpenAI client."
+            )
+        model, json_response = self._prepare_submit(
+            message, role, model, json_response
+        )
+
+        llmreply = await _gpt_submit_stream_async(
+            messages=self.to_dict_list(),
+            openai_client=self.async_openai_client,
+            on_delta=on_delta,
+            json_response=json_response,
+            model=model,
+            has_datetime_msg=self._has_datetime_msg,
+            prompt_cache_key=self.prompt_cache_key,
         )
 
         self.add_assistant_message(llmreply)
@@ -367,13 +1335,21 @@ class GptConversation(list):
 
     def add_message(self, role: str, content: Any) -> "GptConversation":
         """Add a message to the conversation."""
-        if not isinstance(content, str):
-            content = (
-                json.dumps(content, indent=2)
-                if isinstance(content, dict)
-                else str(content)
-            )
-        self.append({"role": role, "content": content})
+        message = {"role": role, "content": _message_content_str(content)}
+        if role == "system" and _is_datetime_message(message):
+            self._has_datetime_msg = True
+        self.append(message)
+        return self
+
+    def add_messages(self, pairs: Iterable[Tuple[str, Any]]) -> "GptConversation":
+        """Add several (role, content) messages to the conversation at once."""
+        messages = [
+            {"role": role, "content": _message_content_str(content)}
+            for role, content in pairs
+        ]
+        if not self._has_datetime_msg:
+            self._has_datetime_msg = any(_is_datetime_message(m) for m in messages)
+        self.extend(messages)
         return self
 
     def add_user_message(self, content: Any) -> "GptConversation":
@@ -422,6 +1398,27 @@ class GptConversation(list):
         retval = self.submit()
         return retval
 
+    async def asubmit_message(self, role: str, content: Any) -> Any:
+        """Async version of submit_message."""
+        self.add_message(role, content)
+        return await self.asubmit()
+
+    async def asubmit_user_message(self, content: Any) -> Any:
+        """Async version of submit_user_message."""
+        return await self.asubmit_message("user", content)
+
+    async def asubmit_assistant_message(self, content: Any) -> Any:
+        """Async version of submit_assistant_message."""
+        return await self.asubmit_message("assistant", content)
+
+    async def asubmit_system_message(self, content: Any) -> Any:
+        """Async version of submit_system_message."""
+        return await self.asubmit_message("system", content)
+
+    async def asubmit_developer_message(self, content: Any) -> Any:
+        """Async version of submit_developer_message."""
+        return await self.asubmit_message("developer", content)
+
     def get_last_message(self) -> Optional[dict]:
         """Get the last message in the conversation."""
         return self[-1] if self else None
@@ -440,7 +1437,7 @@ class GptConversation(list):
         """Return a clone of the last reply as a dictionary (useful for API calls)."""
         if type(self.last_reply) is not dict:
             return {}
-        return json.loads(json.dumps(self.last_reply))
+        return _fast_json_deepcopy(self.last_reply)
 
     def get_last_reply_dict_field(self, fieldname: str, default: Any = None) -> Any:
         """Return a specific field from the last reply dictionary (or None if not found)."""
@@ -0,0 +1,252 @@
+"""Response caches for LLM calls."""
+
+import hashlib
+import json
+import math
+import os
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Protocol, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; SemanticCache falls back to pure Python.
+    np = None
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib json module.
+    orjson = None
+
+
+def _sorted_json_bytes(obj: Any) -> bytes:
+    """Serialize obj with sorted keys, for hashing.
+
+    Keys made with and without orjson differ, which only costs a round of cache
+    misses if orjson is installed (or removed) under a persistent cache.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
+    return json.dumps(obj, sort_keys=True).encode("utf-8")
+
+
+class CacheBackend(Protocol):
+    """Storage for cached LLM replies, keyed by string."""
+
+    def get(self, key: str) -> Optional[Any]: ...
+
+    def set(self, key: str, value: Any) -> None: ...
+
+    def delete(self, key: str) -> None: ...
+
+    def clear(self) -> None: ...
+
+
+class LRUCacheBackend:
+    """In-memory cache that evicts the least recently used entry when full."""
+
+    def __init__(self, maxsize: int = 1024) -> None:
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        if key not in self._entries:
+            return None
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    def set(self, key: str, value: Any) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class JSONFileCacheBackend:
+    """Cache that persists to a JSON file, so that hits survive across runs."""
+
+    def __init__(self, path: str = "data/llm_cache.json") -> None:
+        self.path = path
+        self._entries: Optional[Dict[str, Any]] = None
+
+    def _load(self) -> Dict[str, Any]:
+        if self._entries is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._entries = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                self._entries = {}
+        return self._entries
+
+    def _save(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Write to a temp file and swap it in, so a crash can't leave a torn file.
+        tmppath = f"{self.path}.tmp"
+        with open(tmppath, "w", encoding="utf-8") as f:
+            json.dump(self._load(), f)
+        os.replace(tmppath, self.path)
+
+    def get(self, key: str) -> Optional[Any]:
+        return self._load().get(key)
+
+    def set(self, key: str, value: Any) -> None:
+        self._load()[key] = value
+        self._save()
+
+    def delete(self, key: str) -> None:
+        if self._load().pop(key, None) is not None:
+            self._save()
+
+    def clear(self) -> None:
+        self._entries = {}
+        self._save()
+
+
+def response_cache_key(model: str, messages: list, json_response: Any) -> str:
+    """Hash a request into a cache key. Equal requests always produce equal keys."""
+    payload = _sorted_json_bytes(
+        {"model": model, "messages": messages, "json_response": json_response}
+    )
+    return hashlib.sha256(payload).hexdigest()
+
+
+class ResponseCache:
+    """Exact-match cache of LLM replies, with hit/miss counters."""
+
+    def __init__(self, backend: Optional[CacheBackend] = None) -> None:
+        self.backend: CacheBackend = backend or LRUCacheBackend()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return a copy of the cached reply, or None on a miss."""
+        value = self.backend.get(key)
+        if value is None:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return _copy_reply(value)
+
+    def set(self, key: str, value: Any) -> None:
+        self.backend.set(key, _copy_reply(value))
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+
+def _copy_reply(value: Any) -> Any:
+    # Replies are strings or JSON structures. Copy the latter so that callers
+    # can't mutate the cached entry through an alias.
+    if isinstance(value, (dict, list)):
+        if orjson is not None:
+            return orjson.loads(orjson.dumps(value))
+        return json.loads(json.dumps(value))
+    return value
+
+
+def semantic_context_key(model: str, messages: list) -> str:
+    """Hash the model and the messages that precede the final user turn.
+
+    Semantic cache entries only match within an identical context, so that a
+    near-duplicate question in a different conversation doesn't get a stale answer.
+    """
+    payload = _sorted_json_bytes({"model": model, "messages": messages})
+    return hashlib.sha256(payload).hexdigest()
+
+
+class SemanticCache:
+    """Cache of LLM replies keyed by prompt embedding, for near-duplicate prompts.
+
+    A query hits when an entry with the same context has cosine similarity of at
+    least `threshold` with the query embedding.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.92,
+        embedding_model: str = "text-embedding-3-small",
+    ) -> None:
+        self.threshold = threshold
+        self.embedding_model = embedding_model
+        self._vectors: Any = [] if np is None else None  # (N, D) unit vectors
+        self._contexts: List[str] = []
+        self._values: List[Any] = []
+        self.stats = {"hits": 0, "misses": 0}
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    @staticmethod
+    def _normalize(embedding: Sequence[float]) -> Any:
+        if np is not None:
+            vector = np.asarray(embedding, dtype=np.float32)
+            norm = float(np.linalg.norm(vector))
+            return vector / norm if norm else vector
+        norm = math.sqrt(sum(x * x for x in embedding))
+        return [x / norm for x in embedding] if norm else list(embedding)
+
+    def _similarities(self, query: Any) -> List[float]:
+        if not self._values:
+            return []
+        if np is not None:
+            return (self._vectors @ query).tolist()
+        return [sum(a * b for a, b in zip(v, query)) for v in self._vectors]
+
+    def query(self, embedding: Sequence[float], context: str = "") -> Optional[Any]:
+        """Return (a copy of) the closest cached reply if it's similar enough."""
+        best_index = None
+        best_similarity = self.threshold
+        query = self._normalize(embedding)
+        for i, similarity in enumerate(self._similarities(query)):
+            if self._contexts[i] == context and similarity >= best_similarity:
+                best_index = i
+                best_similarity = similarity
+        if best_index is None:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return _copy_reply(self._values[best_index])
+
+    def add(self, embedding: Sequence[float], value: Any, context: str = "") -> None:
+        vector = self._normalize(embedding)
+        if np is not None:
+            row = vector.reshape(1, -1)
+            self._vectors = (
+                row if self._vectors is None else np.vstack([self._vectors, row])
+            )
+        else:
+            self._vectors.append(vector)
+        self._contexts.append(context)
+        self._values.append(_copy_reply(value))
+
+    def clear(self) -> None:
+        self._vectors = [] if np is None else None
+        self._contexts = []
+        self._values = []
+
+    def save(self, path: str) -> None:
+        """Persist to `path` (JSON), plus `path`.npy for the vectors if numpy is present."""
+        data: Dict[str, Any] = {"contexts": self._contexts, "values": self._values}
+        if np is not None:
+            if self._vectors is not None:
+                np.save(f"{path}.npy", self._vectors)
+        else:
+            data["vectors"] = self._vectors
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+
+    def load(self, path: str) -> None:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        self._contexts = data["contexts"]
+        self._values = data["values"]
+        if np is not None:
+            self._vectors = np.load(f"{path}.npy") if self._values else None
+        else:
+            self._vectors = data.get("vectors", [])
@@ -0,0 +1,80 @@
+"""Logging setup for the command-line game."""
+
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+from typing import Optional
+
+
+class _FlushRequest:
+    """A queue item that the listener answers once everything before it is written."""
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+
+
+class _FlushableQueueListener(logging.handlers.QueueListener):
+    """A QueueListener that answers _FlushRequests, and knows if it's running."""
+
+    running = False
+
+    def start(self) -> None:
+        super().start()
+        self.running = True
+
+    def stop(self) -> None:
+        self.running = False
+        super().stop()
+
+    def handle(self, record) -> None:
+        if isinstance(record, _FlushRequest):
+            record.done.set()
+            return
+        super().handle(record)
+
+
+_listener: Optional[_FlushableQueueListener] = None
+
+
+def configure_logging(level: int = logging.INFO) -> logging.handlers.QueueListener:
+    """Route log records through a queue to a background thread that writes stdout.
+
+    Records are formatted as bare messages, so log output reads the same as
+    the print() output it replaces. Call stop() on the returned listener
+    before exiting to flush anything still queued.
+    """
+    global _listener
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(logging.Formatter("%(message)s"))
+    listener = _FlushableQueueListener(log_queue, stream_handler)
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+
+    # httpx logs every request at INFO, which would drown out the game.
+    for noisy in ("httpx", "httpcore", "openai"):
+        logging.getLogger(noisy).setLevel(logging.WARNING)
+
+    listener.start()
+    _listener = listener
+    return listener
+
+
+def flush_logs(timeout: float = 1.0) -> None:
+    """Wait until everything logged so far has been written to stdout.
+
+    Log records are written on the listener's thread, so print() output can
+    overtake them. Call this before printing anything that should come after
+    the log lines before it (the board, a prompt, narration).
+    """
+    if _listener is None or not _listener.running:
+        return
+    request = _FlushRequest()
+    _listener.queue.put_nowait(request)
+    request.done.wait(timeout)
@@ -0,0 +1,28 @@
+"""Client-side rate limiting for API calls."""
+
+import asyncio
+import time
+
+
+class AsyncRateLimiter:
+    """Spaces out requests so that no more than `qpm` start per minute.
+
+    Each acquire() reserves the next free slot under a lock, then sleeps until
+    that slot comes up outside of the lock, so waiting callers queue up in order
+    without holding each other up.
+    """
+
+    def __init__(self, qpm: float) -> None:
+        if qpm <= 0:
+            raise ValueError(f"qpm must be positive, got {qpm}")
+        self.interval = 60.0 / qpm
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self._next_slot - now)
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if wait:
+            await asyncio.sleep(wait)
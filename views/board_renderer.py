@@ -1,12 +1,25 @@
 """ASCII rendering for the game board."""
 
+import functools
+from typing import Tuple
+
 from models.board import Board
-from models.entities import Coordinates, EntityType
+from models.entities import EntityType
+
+# A Board.fingerprint(): the grid as a tuple of rows.
+GridSnapshot = Tuple[Tuple[EntityType, ...], ...]
+
+# The board only changes when a shot lands, so most turns render a grid that's
+# already been rendered. Identical grids also give identical prompt text,
+# which keeps the LLM's prompt cache warm.
+_RENDER_CACHE_SIZE = 64
 
 
 class BoardRenderer:
     """Renders a board as ASCII art."""
 
+    __slots__ = ("board",)
+
     # Display symbols for each entity type
     SYMBOLS = {
         EntityType.EMPTY: "·",
@@ -30,25 +43,7 @@ class BoardRenderer:
         Returns:
             A string representation of the board
         """
-        lines = []
-
-        # Header with column letters
-        header = "    " + " ".join(chr(ord("A") + i) for i in range(self.board.cols))
-        lines.append(header)
-        lines.append("   " + "─" * (self.board.cols * 2))
-
-        # Board rows
-        for row in range(self.board.rows):
-            row_chars = []
-            for col in range(self.board.cols):
-                entity = self.board.get_entity_at(Coordinates(row, col))
-                symbol = self.SYMBOLS.get(entity, "?") if entity else "?"
-                row_chars.append(symbol)
-
-            row_str = f"{row + 1} │ " + " ".join(row_chars)
-            lines.append(row_str)
-
-        return "\n".join(lines)
+        return _render(self.board.fingerprint())
 
     def render_with_legend(self) -> str:
         """
@@ -57,17 +52,7 @@ class BoardRenderer:
         Returns:
             Board with legend
         """
-        board_str = self.render()
-
-        legend = [
-            "",
-            "Legend:",
-            f"  {self.SYMBOLS[EntityType.SHIP]} = Ship",
-            f"  {self.SYMBOLS[EntityType.HOSTAGE]} = Hostage",
-            f"  {self.SYMBOLS[EntityType.EMPTY]} = Empty",
-        ]
-
-        return board_str + "\n" + "\n".join(legend)
+        return _render_with_legend(self.board.fingerprint())
 
     def describe(self) -> str:
         """
@@ -76,21 +61,67 @@ class BoardRenderer:
         Returns:
             A textual description of the board
         """
-        ship_positions = []
-        hostage_positions = []
-        for row in range(self.board.rows):
-            for col in range(self.board.cols):
-                position_str = f"{chr(ord('A') + col)}{row + 1}"
-                entity = self.board.get_entity_at(Coordinates(row, col))
-                if entity == EntityType.SHIP:
-                    ship_positions.append(position_str)
-                elif entity == EntityType.HOSTAGE:
-                    hostage_positions.append(position_str)
-
-        s = f"""
-The board is a grid measuring {self.board.rows}x{self.board.cols}.
-Columns are marked by letters A through {chr(ord("A") + self.board.cols - 1)}.
-Rows are marked by numbers 1 through {self.board.rows}.
+        return _describe(self.board.fingerprint())
+
+
+@functools.lru_cache(maxsize=_RENDER_CACHE_SIZE)
+def _render(grid: GridSnapshot) -> str:
+    rows = len(grid)
+    cols = len(grid[0]) if grid else 0
+    lines = []
+
+    # Header with column letters
+    header = "    " + " ".join(chr(ord("A") + i) for i in range(cols))
+    lines.append(header)
+    lines.append("   " + "─" * (cols * 2))
+
+    # Board rows
+    for row in range(rows):
+        row_chars = []
+        for entity in grid[row]:
+            symbol = BoardRenderer.SYMBOLS.get(entity, "?") if entity else "?"
+            row_chars.append(symbol)
+
+        row_str = f"{row + 1} │ " + " ".join(row_chars)
+        lines.append(row_str)
+
+    return "\n".join(lines)
+
+
+@functools.lru_cache(maxsize=_RENDER_CACHE_SIZE)
+def _render_with_legend(grid: GridSnapshot) -> str:
+    board_str = _render(grid)
+
+    legend = [
+        "",
+        "Legend:",
+        f"  {BoardRenderer.SYMBOLS[EntityType.SHIP]} = Ship",
+        f"  {BoardRenderer.SYMBOLS[EntityType.HOSTAGE]} = Hostage",
+        f"  {BoardRenderer.SYMBOLS[EntityType.EMPTY]} = Empty",
+    ]
+
+    return board_str + "\n" + "\n".join(legend)
+
+
+@functools.lru_cache(maxsize=_RENDER_CACHE_SIZE)
+def _describe(grid: GridSnapshot) -> str:
+    rows = len(grid)
+    cols = len(grid[0]) if grid else 0
+    ship_positions = []
+    hostage_positions = []
+    for row in range(rows):
+        for col in range(cols):
+            position_str = f"{chr(ord('A') + col)}{row + 1}"
+            entity = grid[row][col]
+            if entity == EntityType.SHIP:
+                ship_positions.append(position_str)
+            elif entity == EntityType.HOSTAGE:
+                hostage_positions.append(position_str)
+
+    s = f"""
+The board is a grid measuring {rows}x{cols}.
+Columns are marked by letters A through {chr(ord("A") + cols - 1)}.
+Rows are marked by numbers 1 through {rows}.
 A1 is the top-left corner of the board.
 There are two kinds of entities on the board: SHIPS and HOSTAGES.
 The Allies are trying to hit SHIPS while avoiding HOSTAGES.
@@ -105,4 +136,4 @@ HOSTAGES: There are {
     ", ".join(hostage_positions) if len(hostage_positions) > 0 else "NONE"
 }.
 """
-        return s.strip()
+    return s.strip()